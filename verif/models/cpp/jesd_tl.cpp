@@ -1,5 +1,6 @@
 #include <iostream>
 #include <iomanip>
+#include <cstdlib>
 using namespace std;
 
 class JesdTl {
@@ -620,7 +621,7 @@ void adj_input_data_dim(uint32_t* col, uint16_t R, int num_samp){
             break;
         }
         case 3: { // 368.64 MSps
-            mod_num_samp = (4/3) * num_samp;
+            mod_num_samp = (4 * num_samp) / 3;
             break;
         }
         case 4: { // 491.52 MSps
@@ -628,7 +629,7 @@ void adj_input_data_dim(uint32_t* col, uint16_t R, int num_samp){
             break;
         }
         case 6: {
-            mod_num_samp = (4/3) * num_samp;
+            mod_num_samp = (4 * num_samp) / 3;
             break;
         }
         case 8: { // 491.52 MSps
@@ -703,6 +704,15 @@ int main(int argc, char *argv[]) {
     // Number of samples
     uint32_t num_samp = 12;
 
+    // Optional command line override of the above in the order
+    // L M Np R num_samp. Used by the benchmark suite.
+    if ( argc > 5 ) {
+        L = atoi(argv[1]);
+        M = atoi(argv[2]);
+        Np = atoi(argv[3]);
+        R = atoi(argv[4]);
+        num_samp = atoi(argv[5]);
+    }
 
     // We will now prepare the input data. In the model
     // the number of rows will be the number of converters
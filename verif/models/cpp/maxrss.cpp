@@ -0,0 +1,47 @@
+// Runs a command and writes its peak resident set size to a file:
+//
+//     maxrss <out file> <cmd> [args...]
+//
+// out file gets "<max RSS of cmd in KB> <exit code of cmd>". A child starts
+// out with the pages of the process that forks it, so the max RSS python
+// gets for a binary it spawns directly includes the python interpreter.
+// This launcher is small, so the max RSS it gets is the one of the binary.
+#include <cstdio>
+#include <sys/resource.h>
+#include <sys/wait.h>
+#include <unistd.h>
+
+int main(int argc, char** argv) {
+    if (argc < 3) {
+        fprintf(stderr, "Usage: %s <out file> <cmd> [args...]\n", argv[0]);
+        return 2;
+    }
+
+    pid_t pid = fork();
+    if (pid < 0) {
+        perror("fork");
+        return 2;
+    }
+    if (pid == 0) {
+        execvp(argv[2], argv + 2);
+        perror(argv[2]);
+        _exit(127);
+    }
+
+    int status;
+    struct rusage ru;
+    if (wait4(pid, &status, 0, &ru) < 0) {
+        perror("wait4");
+        return 2;
+    }
+    int code = WIFEXITED(status) ? WEXITSTATUS(status) : 128 + WTERMSIG(status);
+
+    FILE* f = fopen(argv[1], "w");
+    if (f == NULL) {
+        perror(argv[1]);
+        return 2;
+    }
+    fprintf(f, "%ld %d\n", ru.ru_maxrss, code); // KB on linux
+    fclose(f);
+    return code;
+}
@@ -0,0 +1,27 @@
+## Description:
+## JESD204 transport layer models. The rate calculators, CC enumerator,
+## link optimizer, the lane mapping model and the JESD204B 8b/10b link
+## layer as an importable package.
+## Only numpy is needed for the computations. xlsxwriter (spreadsheets),
+## prettytable (printed tables) and python-constraint (get_ccs) are only
+## imported when those features are used.
+##
+## Command line: python3 -m jesd --help
+
+from .ip_rate_calculator import enc_rate, lr, enc_rate_b, lr_b, get_link_mode, get_rates
+from .jesd_calculator import (list_of_cc_bws, dict_fs, get_ccs, get_cc_partitions,
+                              get_lane_rate_table, sweep_carrier_plans)
+from .rate_table import IndexedTable, rate_sweep, get_rate_table
+from .link_optimizer import optimize
+from .tl_2_dl_mapping import (s2w, lseq_v2, new_lseq_state, get_lane_streams, pack_lane_words, pack_lane,
+                              get_lane_index, get_lane_pool,
+                              get_lane_map, get_sample_pattern, get_strb_pattern, get_strb_masks,
+                              get_strb_window, get_num_cycles, get_num_phases, get_sample_rate,
+                              map_samples, os_repeat, s_interleave)
+from .datapath import (gen_conv_data, map_s_2_cw, map_cw_2_ng, get_nibble_rows, get_lane_words,
+                       lseq_lane_words, run_datapath)
+from .jesd204b import (encode_8b10b, get_lane_octets, insert_ctrl_chars, get_ilas_config, get_ilas,
+                       get_link_stream)
+from .checkpoint import save_checkpoint, load_checkpoint, map_sweep, soak
+from .golden import record as record_golden, diff as diff_golden
+from .latency import get_config_latency, sweep_latency, get_dual_timing
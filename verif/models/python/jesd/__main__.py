@@ -0,0 +1,257 @@
+## Description:
+## Command line interface of the jesd package.
+##
+##   python3 -m jesd rates        JESD_Rates.xlsx (ip_rate_calculator)
+##   python3 -m jesd calc         JESD_Calculations.xlsx (jesd_calculator)
+##   python3 -m jesd sweep        Carrier plan sweep over bandwidth targets
+##   python3 -m jesd optimize     Best link configurations for a carrier plan
+##   python3 -m jesd query        Rate table query, e.g. M=8 L=:4 lane_rate=:16.22016
+##   python3 -m jesd map          S2W + LSEQ lane mapping (tl_2_dl_mapping)
+##   python3 -m jesd serve        Local JSON service
+##   python3 -m jesd bench        Benchmarks
+##   python3 -m jesd fuzz         Randomized invariant checks of the lane sequencer
+##   python3 -m jesd map-sweep    Lane mapping over all configurations, resumable
+##   python3 -m jesd soak         Long numeric data path run, resumable
+##   python3 -m jesd golden       Record / diff lane stream signatures
+##   python3 -m jesd latency      Link latency table query, e.g. dual=true latency=:100
+
+import argparse
+import sys
+
+
+def cmd_rates(args):
+    from .ip_rate_calculator import main
+    main(args.out, args.np, args.lanes, args.m, args.fs, args.os, args.s, args.mode)
+
+
+def cmd_calc(args):
+    from .jesd_calculator import main
+    main(args.out, args.trx, args.ccs, args.bw, args.lanes, args.np, args.mode)
+
+
+def cmd_sweep(args):
+    from .jesd_calculator import main_sweep
+    bws = list(range(args.bw_start, args.bw_stop + 1, args.bw_step))
+    main_sweep(bws, args.trx, args.ccs, args.lanes, args.np, args.workers, args.mode)
+
+
+def cmd_optimize(args):
+    from .link_optimizer import optimize
+    for cfg in optimize(args.bw, args.ccs, args.trx, args.np, args.lanes, args.os,
+                        args.objective, args.k, args.exact, args.mode):
+        print(cfg)
+
+
+def cmd_query(args):
+    from .rate_service import get_rate_conds
+    from .rate_table import get_rate_table
+    table = get_rate_table(feasible_only=False, mode=args.mode)
+    params = dict(c.split('=', 1) for c in args.conds)
+    for r in table.query(**get_rate_conds(params, True)):
+        print(r)
+
+
+def cmd_map(args):
+    from .tl_2_dl_mapping import main
+    main(args.np, args.m, args.lanes, args.r, args.nsamp, args.out, not args.quiet, args.os, args.s, args.mode)
+
+
+def cmd_serve(args):
+    from .rate_service import main
+    main(args)
+
+
+def cmd_bench(args):
+    from .benchmarks import main
+    main(args)
+
+
+def cmd_fuzz(args):
+    from .fuzz_lseq import main
+    res = main(args.seed, args.batches, args.batch_size, args.workers, args.max_samp)
+    return 1 if res['fails'] else 0
+
+
+def cmd_map_sweep(args):
+    from .checkpoint import get_map_configs, map_sweep
+    configs = get_map_configs(args.nsamp, args.m, args.lanes, args.np, args.r, args.os, args.s)
+    res = map_sweep(configs, args.checkpoint, args.every)
+    print("Configurations: ", len(res))
+    if args.out:
+        import json
+        with open(args.out, 'w') as f:
+            json.dump(res, f, indent=1)
+
+
+def cmd_soak(args):
+    from .checkpoint import soak
+    res = soak(args.m, args.lanes, args.np, args.r, args.cycles, args.block, args.checkpoint, args.every,
+               args.n, args.cs, args.cf, args.seed)
+    print("Cycles: ", res['cycle'])
+    print("Words per lane: ", res['words'])
+    print("Digest: ", res['digest'])
+
+
+def cmd_golden(args):
+    from .golden import diff, record
+    if args.action == 'record':
+        store = record(args.store, workers=args.workers)
+        print("Recorded ", len(store['configs']), " configurations to ", args.store)
+        return 0
+    res = diff(args.store, args.workers)
+    for r in res:
+        if r['reason'] == 'cycles':
+            print(r['key'], ": ", r['golden'], " cycles in golden, ", r['new'], " now")
+        else:
+            print(r['key'], ": first difference at cycle ", r['cycle'], " lane ", r['lane'],
+                  " (", r['chunks'], " chunks, words ", r['golden_words'], " -> ", r['new_words'], ")")
+    print("Differences: ", len(res))
+    return 1 if res else 0
+
+
+def cmd_latency(args):
+    from .latency import sweep_latency
+    from .rate_service import get_rate_conds
+    table = sweep_latency(workers=args.workers, sysref_phase=args.sysref_phase)
+    params = dict(c.split('=', 1) for c in args.conds)
+    for r in table.query(**get_rate_conds(params, True)):
+        print(r)
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog='jesd', description='JESD204 transport layer models')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('rates', help='Rate sweep to JESD_Rates.xlsx')
+    p.add_argument('--out', default='JESD_Rates.xlsx')
+    p.add_argument('--np', type=int, nargs='+', default=[12, 16, 24, 32, 48])
+    p.add_argument('--lanes', type=int, nargs='+', default=[1, 2, 4, 8])
+    p.add_argument('--m', type=int, nargs='+', default=[2, 4, 8, 16])
+    p.add_argument('--fs', type=float, nargs='+', default=[122.88, 245.76, 491.52, 737.28, 983.04])
+    p.add_argument('--os', type=int, nargs='+', default=[1, 2])
+    p.add_argument('--s', type=int, nargs='+', default=[1, 2])
+    p.add_argument('--mode', choices=['204C', '204B'], default='204C', help='Link mode (64b/66b or 8b/10b)')
+    p.set_defaults(fn=cmd_rates)
+
+    p = sub.add_parser('calc', help='CC combinations x lanes to JESD_Calculations.xlsx')
+    p.add_argument('--out', default='JESD_Calculations.xlsx')
+    p.add_argument('--trx', type=int, nargs='+', default=[2, 4])
+    p.add_argument('--ccs', type=int, nargs='+', default=[2])
+    p.add_argument('--bw', type=int, default=100)
+    p.add_argument('--lanes', type=int, nargs='+', default=[2, 4, 8, 16])
+    p.add_argument('--np', type=int, default=16)
+    p.add_argument('--mode', choices=['204C', '204B'], default='204C', help='Link mode (64b/66b or 8b/10b)')
+    p.set_defaults(fn=cmd_calc)
+
+    p = sub.add_parser('sweep', help='Carrier plan sweep over composite bandwidths')
+    p.add_argument('--bw-start', type=int, default=20)
+    p.add_argument('--bw-stop', type=int, default=400)
+    p.add_argument('--bw-step', type=int, default=5)
+    p.add_argument('--trx', type=int, nargs='+', default=[2, 4])
+    p.add_argument('--ccs', type=int, nargs='+', default=[2])
+    p.add_argument('--lanes', type=int, nargs='+', default=[2, 4, 8, 16])
+    p.add_argument('--np', type=int, default=16)
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--mode', choices=['204C', '204B'], default='204C', help='Link mode (64b/66b or 8b/10b)')
+    p.set_defaults(fn=cmd_sweep)
+
+    p = sub.add_parser('optimize', help='Best link configurations for a composite bandwidth')
+    p.add_argument('--bw', type=int, default=100)
+    p.add_argument('--ccs', type=int, default=2, help='Maximum number of CCs')
+    p.add_argument('--trx', type=int, nargs='+', default=[2, 4])
+    p.add_argument('--np', type=int, nargs='+', default=[12, 16, 24, 32, 48])
+    p.add_argument('--lanes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    p.add_argument('--os', type=int, nargs='+', default=[1, 2])
+    p.add_argument('--objective', choices=['lanes', 'lane_rate'], default='lanes')
+    p.add_argument('--k', type=int, default=10)
+    p.add_argument('--exact', action='store_true', help='Lane rate has to be one of the allowed lane rates')
+    p.add_argument('--mode', choices=['204C', '204B'], default='204C', help='Link mode (64b/66b or 8b/10b)')
+    p.set_defaults(fn=cmd_optimize)
+
+    p = sub.add_parser('query', help='Rate table query')
+    p.add_argument('conds', nargs='*', help='column=value, column=lo:hi or column=a,b,c')
+    p.add_argument('--mode', choices=['204C', '204B'], default='204C', help='Link mode (64b/66b or 8b/10b)')
+    p.set_defaults(fn=cmd_query)
+
+    p = sub.add_parser('map', help='S2W + LSEQ lane mapping')
+    p.add_argument('--np', type=int, default=16)
+    p.add_argument('--m', type=int, default=8)
+    p.add_argument('--lanes', type=int, default=16)
+    p.add_argument('--r', type=int, default=1)
+    p.add_argument('--nsamp', type=int, default=12)
+    p.add_argument('--os', type=int, default=1, choices=[1, 2], help='Sample repeat')
+    p.add_argument('--s', type=int, default=1, choices=[1, 2], help='Samples per converter per frame')
+    p.add_argument('--out', default=None)
+    p.add_argument('--quiet', action='store_true', help='Do not print the lane tables')
+    p.add_argument('--mode', choices=['serial', 'lanes', 'pool'], default='serial', help='lseq_v2 execution mode')
+    p.set_defaults(fn=cmd_map)
+
+    from .rate_service import add_args as serve_args
+    p = sub.add_parser('serve', help='Local JSON service')
+    serve_args(p)
+    p.set_defaults(fn=cmd_serve)
+
+    from .benchmarks import add_args as bench_args
+    p = sub.add_parser('bench', help='Benchmarks')
+    bench_args(p)
+    p.set_defaults(fn=cmd_bench)
+
+    p = sub.add_parser('fuzz', help='Randomized invariant checks of the lane sequencer')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--batches', type=int, default=16)
+    p.add_argument('--batch-size', type=int, default=50)
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--max-samp', type=int, default=64)
+    p.set_defaults(fn=cmd_fuzz)
+
+    p = sub.add_parser('map-sweep', help='Lane mapping over all configurations, resumable')
+    p.add_argument('--nsamp', type=int, default=64)
+    p.add_argument('--m', type=int, nargs='+', default=[2, 4, 8, 16])
+    p.add_argument('--lanes', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    p.add_argument('--np', type=int, nargs='+', default=[12, 16, 24, 32, 48])
+    p.add_argument('--r', type=int, nargs='+', default=[1, 2, 3, 4, 6, 8])
+    p.add_argument('--os', type=int, nargs='+', default=[1, 2])
+    p.add_argument('--s', type=int, nargs='+', default=[1, 2])
+    p.add_argument('--checkpoint', default=None, help='Checkpoint file, resumes from it if it exists')
+    p.add_argument('--every', type=float, default=30.0, help='Seconds between checkpoints')
+    p.add_argument('--out', default=None, help='Write the results as JSON')
+    p.set_defaults(fn=cmd_map_sweep)
+
+    p = sub.add_parser('soak', help='Long numeric data path run, resumable')
+    p.add_argument('--m', type=int, default=8)
+    p.add_argument('--lanes', type=int, default=8)
+    p.add_argument('--np', type=int, default=16)
+    p.add_argument('--r', type=int, default=4)
+    p.add_argument('--cycles', type=int, default=1 << 20)
+    p.add_argument('--block', type=int, default=4096)
+    p.add_argument('--n', type=int, default=16, help='Converter resolution')
+    p.add_argument('--cs', type=int, default=0)
+    p.add_argument('--cf', type=int, default=0)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--checkpoint', default=None, help='Checkpoint file, resumes from it if it exists')
+    p.add_argument('--every', type=float, default=30.0, help='Seconds between checkpoints')
+    p.set_defaults(fn=cmd_soak)
+
+    p = sub.add_parser('golden', help='Record / diff lane stream signatures')
+    p.add_argument('action', choices=['record', 'diff'])
+    p.add_argument('--store', default='golden.json')
+    p.add_argument('--workers', type=int, default=None)
+    p.set_defaults(fn=cmd_golden)
+
+    p = sub.add_parser('latency', help='Link latency table query')
+    p.add_argument('conds', nargs='*', help='column=value, column=lo:hi or column=a,b,c')
+    p.add_argument('--workers', type=int, default=None)
+    p.add_argument('--sysref-phase', type=int, default=None,
+                   help='SYSREF phase in clocks after the first strobe, worst case over all phases if not given')
+    p.set_defaults(fn=cmd_latency)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    return args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,402 @@
+## Description:
+## Benchmark suite for the model hot paths. Every benchmark is timed over
+## a parameter matrix that goes from small configurations up to
+## M=16/L=16/Np=48 and from short to long captures. Results are stored as
+## JSON so that a run can be compared against a baseline.
+##
+## Benchmarks:
+##   get_ccs            CC combinations by num_ccs (constraint solver)
+##   rate_sweep         get_rates / get_rate_table
+##   optimize           link optimizer search, up to 16 CCs over 400 MHz
+##                      with exact lane rates
+##   sample_pattern     get_sample_pattern
+##   lseq_v2            lane sequencer (on the s2w output), serial and
+##                      split per lane (lseq_v2_lanes)
+##   datapath           numeric map_s_2_cw, map_cw_2_ng and nibble rows
+##                      with and without control bits (CS/CF)
+##   8b10b              JESD204B character replacement and 8b/10b encoding
+##                      of lane octets
+##   xlsx               xls_sheet_conv_if, xls_sheet_lane_if, add_row
+##   cpp_map_ng_2_lane  C++ JesdTl model (verif/models/cpp/jesd_tl.cpp)
+##
+## Every result reports the best and median time of the repeats, samples/s
+## and cycles/s (where the benchmark has samples/cycles) and peak memory
+## (tracemalloc for python, max RSS for the C++ binary, measured through
+## the small launcher verif/models/cpp/maxrss.cpp).
+##
+## Usage:
+##   python3 -m jesd bench --out bench.json
+##   python3 -m jesd bench --baseline bench.json --threshold 0.2
+##   python3 -m jesd bench --quick --filter lseq
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from .ip_rate_calculator import add_row, add_xls_sheet_header, get_rates
+from .jesd_calculator import get_ccs
+from .link_optimizer import optimize
+from .rate_table import get_rate_table, rate_sweep
+from .datapath import gen_conv_data, get_nibble_rows, map_cw_2_ng, map_s_2_cw
+from .jesd204b import encode_8b10b, insert_ctrl_chars
+from .tl_2_dl_mapping import (get_num_cycles, get_sample_pattern, lseq_v2, s2w, xls_sheet_conv_if,
+                              xls_sheet_lane_if)
+
+cpp_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'cpp')
+cpp_src = os.path.join(cpp_dir, 'jesd_tl.cpp')
+maxrss_src = os.path.join(cpp_dir, 'maxrss.cpp')
+
+# Parameter matrix. Each entry of a lane mapping matrix is (M, L, Np, R, nSamp).
+# Data path entries are (M, Np, R, nSamp, N, CS, CF), 8b10b entries are
+# (L, octets per lane, F, K), optimize entries are (tot_bw, num_ccs, n_trx,
+# objective, exact).
+matrix = {
+    'get_ccs'        : [1, 2, 3, 4],
+    'optimize'       : [(100, 2, [2, 4], 'lanes', False), (400, 16, [16], 'lane_rate', True),
+                        (400, 16, [2, 4, 8, 16], 'lane_rate', True)],
+    'sample_pattern' : [(2, 2, 16, 1, 64), (8, 16, 16, 4, 1024), (16, 16, 48, 8, 4096), (16, 16, 48, 3, 4096)],
+    'lseq_v2'        : [(2, 2, 16, 1, 64), (8, 16, 16, 4, 1024), (16, 16, 32, 8, 4096), (16, 8, 16, 6, 4096),
+                        (16, 16, 48, 8, 4096), (16, 16, 48, 3, 4096)],
+    'datapath'       : [(16, 16, 8, 4096, 16, 0, 0), (16, 16, 8, 4096, 12, 4, 0), (16, 16, 8, 4096, 16, 2, 2),
+                        (16, 48, 8, 65536, 12, 4, 0)],
+    '8b10b'          : [(1, 4096, 4, 32), (8, 65536, 2, 32), (16, 1 << 20, 8, 32)],
+    'xlsx'           : [(2, 2, 16, 1, 64), (8, 16, 16, 4, 256), (16, 16, 32, 8, 1024)],
+    'cpp'            : [(2, 2, 16, 1, 64), (16, 8, 16, 8, 1024), (16, 16, 32, 8, 4096)],
+}
+
+quick_matrix = {
+    'get_ccs'        : [1, 2],
+    'optimize'       : [(100, 2, [2, 4], 'lanes', False), (400, 16, [2, 4, 8, 16], 'lane_rate', True)],
+    'sample_pattern' : [(2, 2, 16, 1, 64), (16, 16, 48, 8, 256)],
+    'lseq_v2'        : [(2, 2, 16, 1, 64), (16, 16, 32, 8, 256), (16, 16, 48, 8, 256), (16, 16, 48, 3, 256)],
+    'datapath'       : [(16, 16, 8, 256, 16, 0, 0), (16, 16, 8, 256, 12, 4, 0)],
+    '8b10b'          : [(1, 4096, 4, 32), (8, 65536, 2, 32)],
+    'xlsx'           : [(2, 2, 16, 1, 64)],
+    'cpp'            : [(2, 2, 16, 1, 64)],
+}
+
+
+def measure(fn, repeat):
+    """
+    Times fn repeat times and then runs it once more under tracemalloc.
+    Returns (list of times, peak memory in KB, last result).
+    """
+    times = []
+    res = None
+    for r in range(repeat):
+        t0 = time.perf_counter()
+        res = fn()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return (times, peak // 1024, res)
+
+
+def result(name, params, times, peak_kb, samples=None, cycles=None, items=None):
+    best = min(times)
+    res = {
+        'name'    : name,
+        'params'  : params,
+        'best_s'  : best,
+        'median_s': statistics.median(times),
+        'repeat'  : len(times),
+        'peak_kb' : peak_kb,
+    }
+    if samples is not None:
+        res['samples_per_s'] = samples / best
+    if cycles is not None:
+        res['cycles_per_s'] = cycles / best
+    if items is not None:
+        res['items_per_s'] = items / best
+    return res
+
+
+def get_key(res):
+    return res['name'] + ' ' + json.dumps(res['params'], sort_keys=True)
+
+
+def bench_get_ccs(mx, repeat):
+    out = []
+    for n in mx['get_ccs']:
+        times, peak, ccs = measure(lambda: get_ccs(n, 100), repeat)
+        out.append(result('get_ccs', {'num_ccs': n, 'bw': 100}, times, peak, items=len(ccs)))
+    return out
+
+
+def bench_rate_sweep(mx, repeat):
+    s = rate_sweep
+    times, peak, rows = measure(lambda: get_rates(s['N_prime'], s['L'], s['M'], s['Fs'], s['OS'], s['S'], feasible_only=False), repeat)
+    out = [result('rate_sweep', {'fn': 'get_rates'}, times, peak, items=len(rows))]
+    times, peak, tab = measure(lambda: get_rate_table(feasible_only=False), repeat)
+    out.append(result('rate_sweep', {'fn': 'get_rate_table'}, times, peak, items=len(tab)))
+    return out
+
+
+def bench_sample_pattern(mx, repeat):
+    out = []
+    for M, L, Np, R, nSamp in mx['sample_pattern']:
+        times, peak, rows = measure(lambda: get_sample_pattern(nSamp, M, R, Np), repeat)
+        params = {'M': M, 'Np': Np, 'R': R, 'nSamp': nSamp}
+        out.append(result('sample_pattern', params, times, peak, samples=nSamp * M, cycles=len(rows)))
+    return out
+
+
+def bench_lseq(mx, repeat):
+    out = []
+    for M, L, Np, R, nSamp in mx['lseq_v2']:
+        in_data = s2w(nSamp, R, M, Np)
+        times, peak, lanes = measure(lambda: lseq_v2(in_data, L, M, R, verbose=False), repeat)
+        params = {'M': M, 'L': L, 'Np': Np, 'R': R, 'nSamp': nSamp}
+        out.append(result('lseq_v2', params, times, peak, samples=nSamp * M, cycles=len(in_data)))
+        times, peak, lanes = measure(lambda: lseq_v2(in_data, L, M, R, verbose=False, mode='lanes'), repeat)
+        out.append(result('lseq_v2_lanes', params, times, peak, samples=nSamp * M, cycles=len(in_data)))
+    return out
+
+
+def bench_datapath(mx, repeat):
+    out = []
+    for M, Np, R, nSamp, N, CS, CF in mx['datapath']:
+        data, valid = gen_conv_data(nSamp, M, R, N, seed=0)
+        ctrl = (data >> 3) & ((1 << CS) - 1)
+
+        def run_stages():
+            cw, cfw = map_s_2_cw(data, valid, ctrl, N, CS, CF, Np)
+            ng = map_cw_2_ng(cw, Np)
+            return get_nibble_rows(ng, Np)
+
+        times, peak, rows = measure(run_stages, repeat)
+        params = {'M': M, 'Np': Np, 'R': R, 'nSamp': nSamp, 'N': N, 'CS': CS, 'CF': CF}
+        out.append(result('datapath', params, times, peak, samples=nSamp * M, cycles=len(rows)))
+    return out
+
+
+def bench_optimize(mx, repeat):
+    out = []
+    for tot_bw, num_ccs, n_trx, objective, exact in mx['optimize']:
+        times, peak, cfgs = measure(lambda: optimize(tot_bw, num_ccs, n_trx, objective=objective, exact=exact),
+                                    repeat)
+        params = {'tot_bw': tot_bw, 'num_ccs': num_ccs, 'n_trx': n_trx, 'objective': objective, 'exact': exact}
+        out.append(result('optimize', params, times, peak, items=len(cfgs)))
+    return out
+
+
+def bench_8b10b(mx, repeat):
+    out = []
+    for L, n, F, K in mx['8b10b']:
+        # Few distinct octets so that /F/ and /A/ replacements do happen
+        octets = np.random.default_rng(0).integers(0, 4, size=(L, n), dtype=np.uint8)
+
+        def run_encode():
+            data, ctrl = insert_ctrl_chars(octets, F, K)
+            return encode_8b10b(data, ctrl)
+
+        times, peak, codes = measure(run_encode, repeat)
+        params = {'L': L, 'octets': n, 'F': F, 'K': K}
+        out.append(result('8b10b', params, times, peak, items=L * n))
+    return out
+
+
+def bench_xlsx(mx, repeat, tmp):
+    import xlsxwriter as xls
+
+    out = []
+    for M, L, Np, R, nSamp in mx['xlsx']:
+        in_data = s2w(nSamp, R, M, Np)
+        lanes = lseq_v2(in_data, L, M, R, verbose=False)
+        book = os.path.join(tmp, 'bench.xlsx')
+
+        def write_conv():
+            wb = xls.Workbook(book)
+            xls_sheet_conv_if(wb, M, Np, in_data, 5, 5, "Nibble Group Output")
+            wb.close()
+
+        def write_lane():
+            wb = xls.Workbook(book)
+            xls_sheet_lane_if(wb, L, 64, lanes, 5, 5, "Lane Output")
+            wb.close()
+
+        params = {'M': M, 'L': L, 'Np': Np, 'R': R, 'nSamp': nSamp}
+        cells = len(in_data) * len(in_data[0])
+        times, peak, r = measure(write_conv, repeat)
+        out.append(result('xlsx_conv_if', params, times, peak, cycles=len(in_data), items=cells))
+        times, peak, r = measure(write_lane, repeat)
+        out.append(result('xlsx_lane_if', params, times, peak, cycles=len(in_data), items=L * len(lanes[0]) * 16))
+
+    s = rate_sweep
+    rows = get_rates(s['N_prime'], s['L'], s['M'], s['Fs'], s['OS'], s['S'])
+    book = os.path.join(tmp, 'rates.xlsx')
+
+    def write_rates():
+        wb = xls.Workbook(book)
+        ws = wb.add_worksheet('Rates')
+        add_xls_sheet_header(wb, ws, 5, 5)
+        for i, (npr, l, m, fs, os_, s_, lane_rate, F) in enumerate(rows):
+            add_row(wb, ws, 7 + i, 5, npr, m, l, fs, lane_rate, os_, s_)
+        wb.close()
+
+    times, peak, r = measure(write_rates, repeat)
+    out.append(result('xlsx_rates', {'rows': len(rows)}, times, peak, items=len(rows)))
+    return out
+
+
+def bench_cpp(mx, repeat, tmp):
+    cxx = shutil.which('g++') or shutil.which('c++')
+    if cxx is None:
+        print("No C++ compiler found, skipping cpp_map_ng_2_lane")
+        return []
+    exe = os.path.join(tmp, 'jesd_tl')
+    subprocess.run([cxx, '-O2', '-o', exe, cpp_src], check=True)
+    launcher = os.path.join(tmp, 'maxrss')
+    subprocess.run([cxx, '-O2', '-o', launcher, maxrss_src], check=True)
+
+    # The max RSS of a child also counts the pages it had before exec, so
+    # the binaries are started from the small launcher rather than from
+    # this process. The max RSS of running 'true' the same way is reported
+    # as floor_kb.
+    floor = spawn(launcher, [shutil.which('true') or '/bin/true'], tmp)[1]
+
+    out = []
+    for M, L, Np, R, nSamp in mx['cpp']:
+        times = []
+        peak = 0
+        for r in range(repeat):
+            t, maxrss = spawn(launcher, [exe, str(L), str(M), str(Np), str(R), str(nSamp)], tmp)
+            times.append(t)
+            peak = max(peak, maxrss)
+
+        # Same cycle count as adj_input_data_dim in the model
+        cycles = get_num_cycles(nSamp, R)
+        params = {'M': M, 'L': L, 'Np': Np, 'R': R, 'nSamp': nSamp}
+        res = result('cpp_map_ng_2_lane', params, times, peak, samples=nSamp * M, cycles=cycles)
+        res['floor_kb'] = floor
+        out.append(res)
+    return out
+
+
+def spawn(launcher, cmd, tmp):
+    """
+    Runs cmd through the maxrss launcher with stdout discarded. Returns
+    (time, max RSS of cmd in KB).
+    """
+    out = os.path.join(tmp, 'maxrss.txt')
+    t0 = time.perf_counter()
+    subprocess.run([launcher, out] + cmd, stdout=subprocess.DEVNULL)
+    t = time.perf_counter() - t0
+    with open(out) as f:
+        maxrss, code = (int(v) for v in f.read().split())
+    if code != 0:
+        raise RuntimeError(cmd[0] + " exited with " + str(code))
+    return (t, maxrss)
+
+
+benches = {
+    'get_ccs'        : lambda mx, rep, tmp: bench_get_ccs(mx, rep),
+    'rate_sweep'     : lambda mx, rep, tmp: bench_rate_sweep(mx, rep),
+    'optimize'       : lambda mx, rep, tmp: bench_optimize(mx, rep),
+    'sample_pattern' : lambda mx, rep, tmp: bench_sample_pattern(mx, rep),
+    'lseq_v2'        : lambda mx, rep, tmp: bench_lseq(mx, rep),
+    'datapath'       : lambda mx, rep, tmp: bench_datapath(mx, rep),
+    '8b10b'          : lambda mx, rep, tmp: bench_8b10b(mx, rep),
+    'xlsx'           : bench_xlsx,
+    'cpp'            : bench_cpp,
+}
+
+
+def run(names=None, repeat=5, quick=False):
+    """
+    Runs the benchmarks (all if names is None) and returns the results
+    as a dictionary that can be written out as JSON.
+    """
+    mx = quick_matrix if quick else matrix
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n, fn in benches.items():
+            if names and not any(f in n for f in names):
+                continue
+            print("Running ", n, "...")
+            results.extend(fn(mx, repeat, tmp))
+    return {
+        'host'    : platform.node(),
+        'python'  : platform.python_version(),
+        'time'    : time.strftime('%Y-%m-%d %H:%M:%S'),
+        'quick'   : quick,
+        'results' : results,
+    }
+
+
+def compare(run_res, base_res, threshold):
+    """
+    Compares the median time of every benchmark against the baseline.
+    Returns a list of (key, baseline, new, ratio, regressed).
+    """
+    base = {get_key(r): r for r in base_res['results']}
+    rows = []
+    for r in run_res['results']:
+        k = get_key(r)
+        if k not in base:
+            continue
+        ratio = r['median_s'] / base[k]['median_s']
+        rows.append((k, base[k]['median_s'], r['median_s'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def print_results(res):
+    for r in res['results']:
+        line = "{:<20} {:<50} best {:10.6f} s  median {:10.6f} s  peak {:8d} KB".format(
+            r['name'], json.dumps(r['params']), r['best_s'], r['median_s'], r['peak_kb'])
+        if 'samples_per_s' in r:
+            line += "  {:12.0f} samples/s".format(r['samples_per_s'])
+        if 'cycles_per_s' in r:
+            line += "  {:12.0f} cycles/s".format(r['cycles_per_s'])
+        if 'items_per_s' in r:
+            line += "  {:12.0f} items/s".format(r['items_per_s'])
+        print(line)
+
+
+def add_args(parser):
+    parser.add_argument('--out', help='Write results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slow down before a benchmark counts as a regression')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quick', action='store_true', help='Small parameter matrix')
+    parser.add_argument('--filter', nargs='*', help='Only run benchmarks whose name contains one of these')
+
+
+def main(args):
+    res = run(args.filter, args.repeat, args.quick)
+    print_results(res)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(res, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            base = json.load(f)
+        regressed = False
+        print("============= Comparison against ", args.baseline)
+        for k, b, n, ratio, bad in compare(res, base, args.threshold):
+            print("{:<80} {:10.6f} -> {:10.6f} s  x{:.2f} {}".format(k, b, n, ratio, 'REGRESSION' if bad else ''))
+            regressed = regressed or bad
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks for the JESD models')
+    add_args(parser)
+    main(parser.parse_args())
@@ -0,0 +1,271 @@
+## Description:
+## Checkpoint and resume for long runs. Two runners write their progress
+## to a JSON checkpoint and continue from it when started again with the
+## same parameters:
+##
+##   map_sweep   get_lane_map over a list of (M, L, Np, R, nSamp, OS, S)
+##               configurations. The checkpoint holds the summary of every
+##               finished configuration.
+##   soak        numeric data path (datapath.py) over a long capture, run
+##               in blocks of cycles. The checkpoint holds the sequencer
+##               state (new_lseq_state), the random generator state, the
+##               words per lane and a running digest of the lane words.
+##
+## Checkpoints are written every `every` seconds, at the end, and when the
+## run stops on an exception, Ctrl-C or SIGTERM (batch pre-emption). Writes
+## are atomic (temporary file + os.replace), so a checkpoint is either the
+## old or the new one, never half written. A resumed run gives the same
+## results as an uninterrupted one. For soak this holds for the same block
+## size, as the random numbers are drawn per block. The parameters are
+## checked before a checkpoint is read or written, so a run that cannot
+## start does not leave a checkpoint behind that can never be resumed.
+##
+## Usage:
+##   python3 -m jesd map-sweep --checkpoint sweep.json
+##   python3 -m jesd soak --cycles 100000000 --checkpoint soak.json
+
+import contextlib
+import hashlib
+import json
+import os
+import signal
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from .datapath import check_ctrl_bits, check_lane_split, gen_conv_data, get_nibble_rows, lseq_lane_words, map_cw_2_ng, map_s_2_cw
+from .tl_2_dl_mapping import get_lane_map, get_strb_window, new_lseq_state
+
+# Acceptable ranges for the parameters. Same as s2w and map_samples.
+acceptable_R = [1, 2, 3, 4, 6, 8]
+acceptable_M = [2, 4, 8, 16]
+acceptable_Np = [12, 16, 24, 32, 48]
+acceptable_OS = [1, 2]
+acceptable_S = [1, 2]
+
+
+def save_checkpoint(path, ckpt):
+    """
+    Writes ckpt (a JSON serializable dictionary) to path atomically.
+    """
+    d = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', dir=d)
+    # mkstemp files are private, use the permissions of a normal file
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(tmp, 0o666 & ~umask)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(ckpt, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load_checkpoint(path, kind, params):
+    """
+    Returns the checkpoint at path if it is a kind checkpoint for the same
+    params, None if there is no checkpoint. A checkpoint of a different
+    run raises ValueError rather than being overwritten.
+    """
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as f:
+        ckpt = json.load(f)
+    if ckpt.get('kind') != kind or ckpt.get('params') != params:
+        raise ValueError(path + " is a checkpoint of a different run")
+    return ckpt
+
+
+@contextlib.contextmanager
+def exit_on_sigterm():
+    """
+    Turns SIGTERM into SystemExit while active so that the runners get to
+    write their last checkpoint. Only possible in the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def handler(signum, frame):
+        raise SystemExit(128 + signum)
+
+    old = signal.signal(signal.SIGTERM, handler)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, old)
+
+
+def get_map_configs(nSamp=64, M=(2, 4, 8, 16), L=(1, 2, 4, 8, 16), Np=(12, 16, 24, 32, 48),
+                    R=(1, 2, 3, 4, 6, 8), OS=(1, 2), S=(1, 2)):
+    """
+    Returns every (M, L, Np, R, nSamp, OS, S) whose converter bus splits
+    evenly across the lanes.
+    """
+    return [[m, l, npr, r, nSamp, os_, s] for m in M for l in L for npr in Np for r in R
+            for os_ in OS for s in S if (2 * m * os_ * s * npr // 4) % l == 0]
+
+
+def check_map_config(M, L, Np, R, nSamp, OS=1, S=1):
+    """
+    Checks one map_sweep configuration (see get_map_configs).
+    """
+    cfg = "[M, L, Np, R, nSamp, OS, S] = " + str([M, L, Np, R, nSamp, OS, S]) + ": "
+    assert R in acceptable_R, cfg + "R should be in: " + str(acceptable_R)
+    assert M in acceptable_M, cfg + "M should be in: " + str(acceptable_M)
+    assert Np in acceptable_Np, cfg + "Np should be in: " + str(acceptable_Np)
+    assert OS in acceptable_OS, cfg + "OS should be in: " + str(acceptable_OS)
+    assert S in acceptable_S, cfg + "S should be in: " + str(acceptable_S)
+    assert nSamp >= 1, cfg + "nSamp should be at least 1"
+    assert L >= 1 and (2 * M * OS * S * Np // 4) % L == 0, cfg + "Converter bus does not split evenly across the lanes"
+
+
+def check_soak_config(M, L, Np, R, cycles, block, N, CS, CF):
+    """
+    Checks the soak parameters (see soak).
+    """
+    assert R in acceptable_R, "R should be in: " + str(acceptable_R)
+    assert Np in acceptable_Np, "Np should be in: " + str(acceptable_Np)
+    assert M >= 1 and L >= 1, "M and L should be at least 1"
+    assert cycles >= 0, "cycles should not be negative"
+    assert block >= 1, "block should be at least 1 cycle"
+    check_ctrl_bits(N, CS, CF, Np)
+    check_lane_split(M, L, Np, CF)
+
+
+def get_map_summary(M, L, Np, R, nSamp, OS=1, S=1):
+    """
+    Runs get_lane_map and returns the number of words every lane emitted
+    and a digest of the lane outputs.
+    """
+    s2w_out, lane = get_lane_map(nSamp, R, M, L, Np, OS, S, mode='lanes')
+    h = hashlib.sha256()
+    for rows in lane:
+        for w in rows:
+            h.update(' '.join(str(n) for n in w).encode())
+            h.update(b'\n')
+    words = [sum(1 for w in rows if 'x' not in w) for rows in lane]
+    return {'cycles': len(s2w_out), 'words': words, 'digest': h.hexdigest()}
+
+
+def map_sweep(configs, path=None, every=30.0, verbose=True):
+    """
+    Runs get_map_summary for every configuration and returns the list of
+    {'config': ..., summary} results. With path the progress is
+    checkpointed and a stopped sweep continues where it stopped.
+    Parameters:
+    -----------
+        configs:    List of [M, L, Np, R, nSamp, OS, S] (see get_map_configs)
+        path:       Checkpoint file
+        every:      Seconds between checkpoints
+        verbose:    Print progress
+    """
+    for cfg in configs:
+        check_map_config(*cfg)
+    params = {'configs': [list(c) for c in configs]}
+    ckpt = load_checkpoint(path, 'map_sweep', params)
+    if ckpt is None:
+        ckpt = {'kind': 'map_sweep', 'params': params, 'results': []}
+    elif verbose:
+        print("Resuming at configuration ", len(ckpt['results']), " of ", len(configs))
+
+    results = ckpt['results']
+    last = time.monotonic()
+    try:
+        with exit_on_sigterm():
+            for cfg in params['configs'][len(results):]:
+                res = {'config': cfg}
+                res.update(get_map_summary(*cfg))
+                results.append(res)
+                if path is not None and time.monotonic() - last >= every:
+                    save_checkpoint(path, ckpt)
+                    last = time.monotonic()
+                    if verbose:
+                        print("Checkpoint at configuration ", len(results), " of ", len(configs))
+    finally:
+        if path is not None:
+            save_checkpoint(path, ckpt)
+    return results
+
+
+def soak(M, L, Np, R, cycles, block=4096, path=None, every=30.0, N=16, CS=0, CF=0, seed=0, verbose=True):
+    """
+    Runs the numeric data path for cycles cycles in blocks of block cycles.
+    Returns the final checkpoint dictionary with the words per lane and the
+    digest of all lane words (sha256, chained over the blocks). With path
+    the progress is checkpointed and a stopped soak continues where it
+    stopped.
+    Parameters:
+    -----------
+        M:          Number of converters
+        L:          Number of lanes
+        Np:         Precision in bits (N')
+        R:          Rate. Multiple of 122.88 MSPs
+        cycles:     Number of 491.52 MHz cycles
+        block:      Cycles per block
+        path:       Checkpoint file
+        every:      Seconds between checkpoints
+        N:          Converter resolution in bits
+        CS:         Control bits per sample
+        CF:         Control words per frame
+        seed:       Seed of the random generator
+        verbose:    Print progress
+    """
+    check_soak_config(M, L, Np, R, cycles, block, N, CS, CF)
+    params = {'M': M, 'L': L, 'Np': Np, 'R': R, 'cycles': cycles, 'block': block,
+              'N': N, 'CS': CS, 'CF': CF, 'seed': seed}
+    ckpt = load_checkpoint(path, 'soak', params)
+    rng = np.random.default_rng(seed)
+    if ckpt is None:
+        ckpt = {'kind': 'soak', 'params': params, 'cycle': 0, 'lseq': new_lseq_state(L),
+                'rng': rng.bit_generator.state, 'words': [0] * L, 'digest': hashlib.sha256().hexdigest()}
+    else:
+        rng.bit_generator.state = ckpt['rng']
+        if verbose:
+            print("Resuming at cycle ", ckpt['cycle'], " of ", cycles)
+
+    last = time.monotonic()
+    try:
+        with exit_on_sigterm():
+            while ckpt['cycle'] < cycles:
+                c0 = ckpt['cycle']
+                c1 = min(c0 + block, cycles)
+                masks = get_strb_window(R, c0, c1)
+
+                data, valid = gen_conv_data(None, M, R, N, rng, masks)
+                ctrl = rng.integers(0, 1 << CS, size=data.shape)
+                cw, cfw = map_s_2_cw(data, valid, ctrl, N, CS, CF, Np)
+                ng = np.concatenate([map_cw_2_ng(cw, Np), cfw], axis=2)
+
+                # The sequencer state is updated in place. Work on a copy
+                # so that the checkpoint stays at the start of the block
+                # until the block is done.
+                lseq = json.loads(json.dumps(ckpt['lseq']))
+                lane = lseq_lane_words(get_nibble_rows(ng, Np), L, masks, lseq)
+
+                h = hashlib.sha256(bytes.fromhex(ckpt['digest']))
+                words = list(ckpt['words'])
+                for l in range(L):
+                    w = lane[l]
+                    h.update(w.astype('<u8').tobytes())
+                    words[l] += int(w.size)
+
+                # Commit the block
+                ckpt.update({'cycle': c1, 'lseq': lseq, 'rng': rng.bit_generator.state,
+                             'words': words, 'digest': h.hexdigest()})
+
+                if path is not None and time.monotonic() - last >= every:
+                    save_checkpoint(path, ckpt)
+                    last = time.monotonic()
+                    if verbose:
+                        print("Checkpoint at cycle ", c1, " of ", cycles)
+    finally:
+        if path is not None:
+            save_checkpoint(path, ckpt)
+    return ckpt
@@ -0,0 +1,252 @@
+## Description:
+## Numeric data path of the transport layer. Where tl_2_dl_mapping works on
+## nibble labels, this works on sample values so that the bit layout of the
+## lanes can be checked against hardware. The stages follow JesdTl in
+## verif/models/cpp/jesd_tl.cpp:
+##
+##   gen_conv_data      random converter samples (stimulus)
+##   map_s_2_cw         control bits, CS per sample or CF control words
+##                      per frame
+##   map_cw_2_ng        converter words to nibble groups of Np bits
+##   get_nibble_rows    nibble groups to S2W rows, which lseq_v2 packs
+##                      into lanes
+##
+## All stages work on whole arrays of shape [cycles, rails, slots] where a
+## slot is a converter (or a control word) and rail 0/1 are the two phases
+## of the 491.52 MHz interface. Slots are in frame order, converter 0
+## first. Converter samples are 16 bit containers, MSB aligned, so a 12 bit
+## sample has its 4 LSBs at 0.
+
+import numpy as np
+
+from .tl_2_dl_mapping import get_lane_streams, get_strb_masks, lseq_v2, new_lseq_state, pack_lane_words
+
+
+def gen_conv_data(nSamp, M, R, N=16, seed=None, masks=None):
+    """
+    Generates random converter samples for every cycle and rail. Returns
+    the samples [cycles, 2, M] (uint16, 0 where not valid) and the valid
+    array of the same shape. The cycles are the ones of nSamp samples, or
+    the ones of masks when given.
+    Parameters:
+    -----------
+        nSamp:  Number of samples
+        M:      Number of converters
+        R:      Rate. Multiple of 122.88 MSPs
+        N:      Converter resolution in bits
+        seed:   Seed of the random generator
+        masks:  Valid masks of rail 0 and rail 1 (see get_strb_window)
+    """
+    assert 1 <= N <= 16, "Converter resolution should be in the range: [1, 16]"
+
+    rng = np.random.default_rng(seed)
+    if masks is None:
+        masks = get_strb_masks(nSamp, R)
+    valid = np.stack(masks, axis=1)
+    valid = np.repeat(valid[:, :, None], M, axis=2)
+    data = rng.integers(0, 1 << N, size=valid.shape, dtype=np.uint16) << np.uint16(16 - N)
+    data[~valid] = 0
+    return (data, valid)
+
+
+def check_ctrl_bits(N, CS, CF, Np):
+    """
+    Checks that the CS control bits of a sample fit. With CF = 0 they follow
+    the sample in the converter word, and map_cw_2_ng keeps the Np MSBs of
+    the 16 bit word (Np = 12 drops the 4 LSBs), so N + CS has to fit in
+    min(Np, 16) bits.
+    Parameters:
+    -----------
+        N:      Converter resolution in bits
+        CS:     Control bits per sample
+        CF:     Control words per frame
+        Np:     Precision in bits (N')
+    """
+    assert CS <= 16, "CS should be less than or equal to 16 bits"
+    if CF == 0:
+        assert N + CS <= min(Np, 16), "N + CS should be less than or equal to min(Np, 16) bits"
+
+
+def check_lane_split(M, L, Np, CF=0):
+    """
+    Checks that the nibble row of a cycle splits evenly across the lanes.
+    Both rails carry M samples and CF control words of Np bits, so a row
+    has 2 x (M + CF) x Np / 4 nibbles.
+    Parameters:
+    -----------
+        M:      Number of converters
+        L:      Number of lanes
+        Np:     Precision in bits (N')
+        CF:     Control words per frame
+    """
+    row_nibbles = 2 * (M + CF) * Np // 4
+    assert row_nibbles % L == 0, ("Nibble row of " + str(row_nibbles) + " nibbles (M = " + str(M) + ", CF = "
+                                  + str(CF) + ", N' = " + str(Np) + ") does not split evenly across "
+                                  + str(L) + " lanes")
+
+
+def map_s_2_cw(data, valid, ctrl, N=16, CS=0, CF=0, Np=16):
+    """
+    Adds the control bits to the converter samples. Returns the converter
+    words [cycles, 2, M] and the control words [cycles, 2, CF].
+
+    With CF = 0 the CS control bits of a sample follow its LSB in the
+    converter word, so N + CS has to fit in min(Np, 16) bits (see
+    check_ctrl_bits). With CF > 0 the
+    samples are left as they are and the control bits of all samples of a
+    frame (one rail of one cycle) go into CF control words of Np bits at
+    the end of the frame, converter 0 first from the MSB.
+    Parameters:
+    -----------
+        data:   Converter samples [cycles, 2, M] (see gen_conv_data)
+        valid:  Valid array of the samples
+        ctrl:   Control bits of every sample, same shape as data. Only the
+                CS LSBs are used.
+        N:      Converter resolution in bits
+        CS:     Control bits per sample
+        CF:     Control words per frame
+        Np:     Precision in bits (N')
+    """
+    check_ctrl_bits(N, CS, CF, Np)
+    assert data.shape == valid.shape == ctrl.shape, "data, valid and ctrl should have the same shape"
+
+    # Only cs number of bits of the control data
+    mask = (1 << CS) - 1
+    bits = np.asarray(ctrl, dtype=np.uint64) & np.uint64(mask)
+    C, nRails, M = data.shape
+
+    if CF == 0:
+        cw = data | (bits << np.uint64(16 - N - CS)).astype(np.uint16)
+        cw[~valid] = 0
+        return (cw, np.zeros((C, nRails, 0), dtype=np.uint64))
+
+    assert M * CS <= CF * Np, "Control bits of a frame do not fit in CF control words"
+
+    # Control bits of a frame as one bit field, converter 0 first from the
+    # MSB. Split into CF words of Np bits.
+    nbits = CF * Np
+    ctrl_bits = np.zeros((C, nRails, nbits), dtype=np.uint8)
+    shifts = np.arange(CS, dtype=np.uint64)[::-1]
+    b = ((bits[..., None] >> shifts) & np.uint64(1)).astype(np.uint8)
+    ctrl_bits[..., :M * CS] = b.reshape(C, nRails, M * CS)
+
+    weights = np.uint64(1) << np.arange(Np, dtype=np.uint64)[::-1]
+    cfw = (ctrl_bits.reshape(C, nRails, CF, Np) * weights).sum(axis=3, dtype=np.uint64)
+    cfw[~valid[:, :, 0]] = 0
+    return (data.copy(), cfw)
+
+
+def map_cw_2_ng(cw, Np):
+    """
+    Converts the 16 bit converter words to nibble groups of Np bits, as in
+    Fig 38 of the JESD204C document. Returns a uint64 array of the same
+    shape.
+    Parameters:
+    -----------
+        cw:     Converter words (see map_s_2_cw)
+        Np:     Precision in bits (N')
+    """
+    cw = np.asarray(cw, dtype=np.uint64)
+    match Np:
+        case 12:
+            return cw >> np.uint64(4)
+        case 16:
+            return cw
+        case 24 | 32 | 48:
+            return cw << np.uint64(Np - 16)
+    raise ValueError("Np should be one of 12, 16, 24, 32 or 48")
+
+
+def get_nibble_rows(ng, Np):
+    """
+    Splits the nibble groups of every cycle into one S2W row of nibbles
+    (uint8), with the same layout as get_sample_pattern: rail 0 then rail
+    1, last slot first and most significant nibble first.
+    Parameters:
+    -----------
+        ng:     Nibble groups [cycles, 2, slots] (see map_cw_2_ng)
+        Np:     Precision in bits (N')
+    """
+    shifts = 4 * np.arange(Np // 4, dtype=np.uint64)[::-1]
+    nibs = (ng[:, :, ::-1, None] >> shifts) & np.uint64(0xF)
+    return nibs.astype(np.uint8).reshape(ng.shape[0], -1)
+
+
+def get_lane_words(lane):
+    """
+    Returns the 64 bit words a lane emitted (lseq_v2 rows without 'x') as
+    uint64 values. Index 15 of a row is the first nibble into the word and
+    goes to the LSBs.
+    Parameters:
+    -----------
+        lane:   lseq_v2 output of one lane
+    """
+    words = [[int(n) for n in w] for w in lane if not any(isinstance(n, str) for n in w)]
+    if not words:
+        return np.zeros(0, dtype=np.uint64)
+    shifts = 4 * np.arange(16, dtype=np.uint64)[::-1]
+    return (np.array(words, dtype=np.uint64) << shifts).sum(axis=1, dtype=np.uint64)
+
+
+def lseq_lane_words(rows, L, masks, state=None):
+    """
+    Same as get_lane_words on the lseq_v2 output, without the lane rows.
+    Every lane is packed with array operations (pack_lane_words). Returns
+    the 64 bit words of every lane. state is a sequencer state as in
+    lseq_v2 and is updated in place.
+    Parameters:
+    -----------
+        rows:   Nibble rows (see get_nibble_rows)
+        L:      Number of lanes
+        masks:  Valid masks of rail 0 and rail 1
+        state:  Sequencer state (see new_lseq_state)
+    """
+    if state is None:
+        state = new_lseq_state(L)
+    assert state['L'] == L, "Sequencer state is for a different number of lanes"
+    assert rows.shape[1] % L == 0, ("Nibble row of " + str(rows.shape[1]) + " nibbles does not split evenly across "
+                                    + str(L) + " lanes")
+
+    half = rows.shape[1] // 2
+    valid = np.repeat(np.stack(masks, axis=1), half, axis=1).reshape(len(rows), L, -1)
+    streams = get_lane_streams(rows.reshape(len(rows), L, -1), valid)
+
+    shifts = 4 * np.arange(16, dtype=np.uint64)
+    out = []
+    for l, (stream, counts) in enumerate(streams):
+        stream, words, e, rest = pack_lane_words(stream, counts, state['pending'][l])
+        out.append((words.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64))
+        state['pending'][l] = rest.tolist()
+    state['cycle'] += len(rows)
+    return out
+
+
+def run_datapath(nSamp, R, M, L, Np, N=16, CS=0, CF=0, seed=None):
+    """
+    Runs the numeric data path from stimulus to lanes. Returns the
+    converter samples, nibble groups (samples followed by the control
+    words of a frame) and the lseq_v2 lane outputs.
+    Parameters:
+    -----------
+        nSamp:  Number of samples
+        R:      Rate. Multiple of 122.88 MSPs
+        M:      Number of converters
+        L:      Number of lanes
+        Np:     Precision in bits (N')
+        N:      Converter resolution in bits
+        CS:     Control bits per sample
+        CF:     Control words per frame
+        seed:   Seed of the random generator for samples and control bits
+    """
+    check_ctrl_bits(N, CS, CF, Np)
+    check_lane_split(M, L, Np, CF)
+    rng = np.random.default_rng(seed)
+    data, valid = gen_conv_data(nSamp, M, R, N, rng)
+    ctrl = rng.integers(0, 1 << CS, size=data.shape)
+
+    cw, cfw = map_s_2_cw(data, valid, ctrl, N, CS, CF, Np)
+    ng = np.concatenate([map_cw_2_ng(cw, Np), cfw], axis=2)
+
+    rows = get_nibble_rows(ng, Np)
+    lane = lseq_v2(rows, L, M, R, verbose=False, masks=get_strb_masks(nSamp, R))
+    return (data, ng, lane)
@@ -0,0 +1,360 @@
+## Description:
+## Randomized invariant checker for the lane sequencer (lseq_v2). Legal
+## (M, L, Np, R, nSamp, OS, S, mode) configurations are drawn from a
+## seeded random generator, run through s2w, the sample mapping (OS/S)
+## and lseq_v2 in the drawn mode, and the lane outputs are checked against
+## the following invariants:
+##   once       every valid nibble of the input appears exactly once in
+##              the lane outputs (emitted words plus the word still being
+##              filled at the end)
+##   order      every lane puts out the valid nibbles of its part of the
+##              input rows in the order they came in. Without sample
+##              repeat the nibbles of every converter/rail also keep their
+##              order (sample, then nibble) by their labels.
+##   partial    a lane word is only emitted when all 16 nibbles are
+##              filled. A word being filled only ever grows until it is
+##              emitted, so no nibbles are dropped with a partial word.
+##   rate       a lane emits one word on every cycle that has 16 nibbles
+##              waiting (pending plus the ones coming in) and none on the
+##              others, floor(valid nibbles of the lane / 16) in all
+##   mode       the lanes and pool modes give the same rows as serial
+##
+## A lane can get more than 16 nibbles on a cycle. It still takes one word
+## per cycle, the rest waits as pending nibbles. A configuration is legal
+## when every lane gets at most 16 nibbles per cycle on average, which is
+## the most a lane can carry.
+##
+## lseq_v2 outputs one row per cycle and lane: the lane word when it is
+## complete, otherwise the word being filled ('x' for empty nibbles). A
+## complete word is a row without 'x'. Nibbles left over after the last
+## input cycle only show up in the next rows, so ceil(nibbles per lane per
+## row / 16) idle cycles are appended to the input to flush them out.
+##
+## Batches run in parallel processes. Batch b of a run with seed s uses
+## seed s + b, so any failure is reproducible from (seed, batch). Failing
+## configurations are shrunk to a minimal failing one.
+##
+## Usage:
+##   python3 -m jesd fuzz --seed 1 --batches 64 --batch-size 50
+
+import math
+import random
+import re
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .tl_2_dl_mapping import get_sample_pattern, get_strb_masks, get_strb_pattern, lseq_v2, map_samples
+
+acceptable_M = [2, 4, 8, 16]
+acceptable_L = [1, 2, 4, 8, 16]
+acceptable_Np = [12, 16, 24, 32, 48]
+acceptable_R = [1, 2, 3, 4, 6, 8]
+acceptable_OS = [1, 2]
+acceptable_S = [1, 2]
+modes = ['serial', 'lanes', 'pool']
+
+# A lane takes one 64 bit word per cycle
+max_lane_nibbles = 16
+
+nib_re = re.compile(r'M(\d+)_R(\d+)_s(\d+)_n(\d+)$')
+
+
+def get_lane_nibbles(M, L, Np, R, OS=1, S=1):
+    """
+    Returns the nibbles of one row into every lane from rail 0 and rail 1
+    and the average nibbles per cycle into every lane. A row has rail 0
+    then rail 1, 2 x M x OS x S x Np / 4 nibbles, and is valid once every
+    S strobes of its rail.
+    """
+    half = M * OS * S * Np // 4
+    chunk = 2 * half // L
+    start = chunk * np.arange(L)
+    n0 = np.clip(half - start, 0, chunk)
+    n1 = chunk - n0
+    r0, r1 = (len(strb) for strb in get_strb_pattern(R))
+    return (n0, n1, (n0 * r0 + n1 * r1) / (8 * S))
+
+
+def is_legal(M, L, Np, R, nSamp, OS=1, S=1, mode='serial'):
+    """
+    A configuration is legal when the converter bus (2 rails x M x OS x S
+    x Np/4 nibbles) splits evenly across L lanes and each lane gets at
+    most max_lane_nibbles nibbles per cycle on average.
+    """
+    if not (M in acceptable_M and L in acceptable_L and Np in acceptable_Np and R in acceptable_R
+            and OS in acceptable_OS and S in acceptable_S and mode in modes and nSamp >= 1):
+        return False
+    if (2 * M * OS * S * Np // 4) % L != 0:
+        return False
+    return get_lane_nibbles(M, L, Np, R, OS, S)[2].max() <= max_lane_nibbles
+
+
+def draw_config(rng, max_samp=64):
+    """
+    Draws a random legal (M, L, Np, R, nSamp, OS, S, mode) configuration.
+    """
+    while True:
+        M = rng.choice(acceptable_M)
+        L = rng.choice(acceptable_L)
+        Np = rng.choice(acceptable_Np)
+        R = rng.choice(acceptable_R)
+        nSamp = rng.randint(1, max_samp)
+        OS = rng.choice(acceptable_OS)
+        S = rng.choice(acceptable_S)
+        mode = rng.choice(modes)
+        if is_legal(M, L, Np, R, nSamp, OS, S, mode):
+            return (M, L, Np, R, nSamp, OS, S, mode)
+
+
+def lane_stream(rows):
+    """
+    Returns the nibble stream of one lane in the order it was filled and
+    the number of complete words. Every row is the state of the lane word
+    at the end of a cycle. Words fill from index 15 down to 0.
+    Also returns a list of violations of the partial invariant.
+    """
+    errs = []
+    stream = []
+    words = 0
+    prev = []   # filled nibbles of the word being filled
+    for c, w in enumerate(rows):
+        # Filled nibbles have to be contiguous from index 15
+        filled = []
+        for i in reversed(range(16)):
+            if w[i] == 'x':
+                break
+            filled.append(w[i])
+        if any(w[i] != 'x' for i in range(16 - len(filled))):
+            errs.append("partial: cycle " + str(c) + " lane word has a hole")
+
+        if filled[:len(prev)] != prev:
+            errs.append("partial: cycle " + str(c) + " word being filled was dropped or changed")
+
+        if len(filled) == 16:
+            stream.extend(filled)
+            words += 1
+            prev = []
+        else:
+            prev = filled
+
+    # Word still being filled at the end
+    stream.extend(prev)
+    return (stream, words, errs)
+
+
+def check_config(M, L, Np, R, nSamp, OS=1, S=1, mode='serial'):
+    """
+    Runs s2w + the sample mapping + lseq_v2 for the configuration and
+    returns a list of invariant violations. An empty list means the
+    configuration passed.
+    """
+    in_data = get_sample_pattern(nSamp, M, R, Np)
+    masks = get_strb_masks(nSamp, R)
+    if OS > 1 or S > 1:
+        in_data, masks = map_samples(in_data, masks, M, Np, OS, S)
+
+    chunk = len(in_data[0]) // L
+    flush = math.ceil(chunk / 16)
+    rows = in_data + [['x'] * len(in_data[0])] * flush
+    masks = tuple(np.append(v, [False] * flush) for v in masks)
+    C = len(rows)
+    try:
+        lanes = lseq_v2(rows, L, M, R, verbose=False, masks=masks, mode=mode)
+        ref = lanes if mode == 'serial' else lseq_v2(rows, L, M, R, verbose=False, masks=masks)
+    except Exception as e:
+        return ["crash: " + repr(e)]
+
+    errs = []
+
+    # mode
+    for l in range(L):
+        if lanes[l] != ref[l]:
+            c = next((c for c, (a, b) in enumerate(zip(lanes[l], ref[l])) if a != b), min(len(lanes[l]), len(ref[l])))
+            errs.append("mode: lane " + str(l) + " differs from serial at cycle " + str(c))
+
+    # Valid input nibbles of every lane in the order they come in. A lane
+    # takes the nibbles of its part of the row from the end.
+    half = len(in_data[0]) // 2
+    valid = Counter()
+    lane_in = [[] for l in range(L)]
+    counts = np.zeros((C, L), dtype=int)
+    for c, r in enumerate(rows):
+        for l in range(L):
+            n = [x for i, x in enumerate(r[l*chunk:(l+1)*chunk]) if masks[(l*chunk + i) // half][c]]
+            valid.update(n)
+            lane_in[l].extend(n[::-1])
+            counts[c, l] = len(n)
+
+    out = Counter()
+    for l in range(L):
+        if len(lanes[l]) != C:
+            errs.append("rate: lane " + str(l) + " has " + str(len(lanes[l])) + " rows for " + str(C) + " cycles")
+        stream, words, e = lane_stream(lanes[l])
+        errs.extend("lane " + str(l) + " " + x for x in e)
+        out.update(stream)
+
+        # order
+        if stream != lane_in[l]:
+            c = next((i for i, (a, b) in enumerate(zip(stream, lane_in[l])) if a != b), min(len(stream), len(lane_in[l])))
+            errs.append("order: lane " + str(l) + " nibble " + str(c) + " is not the one that came in")
+        last = {}
+        for nib in stream:
+            m = nib_re.match(nib)
+            if m is None:
+                errs.append("once: lane " + str(l) + " has an invalid nibble " + repr(nib))
+                continue
+            if OS > 1:
+                # Repeated samples have the same labels
+                continue
+            conv, rail, s_, n = (int(x) for x in m.groups())
+            if (conv, rail) in last and last[(conv, rail)] >= (s_, n):
+                errs.append("order: lane " + str(l) + " M" + str(conv) + "_R" + str(rail) + " s" + str(s_) + "_n" + str(n) + " after s" + str(last[(conv, rail)][0]) + "_n" + str(last[(conv, rail)][1]))
+            last[(conv, rail)] = (s_, n)
+
+        # rate: one word on every cycle that has 16 nibbles waiting
+        waiting = 0
+        for c, w in enumerate(lanes[l]):
+            waiting += counts[c, l]
+            emitted = 'x' not in w
+            if emitted != (waiting >= 16):
+                errs.append("rate: lane " + str(l) + " cycle " + str(c) + " has " + str(waiting) + " nibbles waiting and " + ("emitted" if emitted else "no") + " word")
+                break
+            if emitted:
+                waiting -= 16
+        expect = len(lane_in[l]) // 16
+        if words != expect:
+            errs.append("rate: lane " + str(l) + " emitted " + str(words) + " words, expected " + str(expect))
+
+    # once
+    if out != valid:
+        missing = valid - out
+        extra = out - valid
+        if missing:
+            errs.append("once: " + str(sum(missing.values())) + " nibbles missing, e.g. " + next(iter(missing)))
+        if extra:
+            errs.append("once: " + str(sum(extra.values())) + " nibbles extra/duplicated, e.g. " + next(iter(extra)))
+
+    return errs
+
+
+def run_batch(seed, count, max_samp=64):
+    """
+    Checks count random configurations drawn with seed. Returns the number
+    of configurations checked and a list of (config, violations).
+    """
+    rng = random.Random(seed)
+    fails = []
+    for i in range(count):
+        cfg = draw_config(rng, max_samp)
+        errs = check_config(*cfg)
+        if errs:
+            fails.append((cfg, errs))
+    return (count, fails)
+
+
+def shrink(cfg):
+    """
+    Greedily makes a failing configuration smaller (nSamp, M, Np, L, R, OS,
+    S, then serial mode) as long as it still fails. Returns the minimal
+    configuration found and its violations.
+    """
+    errs = check_config(*cfg)
+    assert errs, "Configuration does not fail"
+
+    def candidates(M, L, Np, R, nSamp, OS, S, mode):
+        for n in (1, nSamp // 2, nSamp - 1):
+            if 1 <= n < nSamp:
+                yield (M, L, Np, R, n, OS, S, mode)
+        for x in acceptable_M:
+            if x < M:
+                yield (x, L, Np, R, nSamp, OS, S, mode)
+        for x in acceptable_Np:
+            if x < Np:
+                yield (M, L, x, R, nSamp, OS, S, mode)
+        for x in acceptable_L:
+            if x < L:
+                yield (M, x, Np, R, nSamp, OS, S, mode)
+        for x in acceptable_R:
+            if x < R:
+                yield (M, L, Np, x, nSamp, OS, S, mode)
+        if OS > 1:
+            yield (M, L, Np, R, nSamp, 1, S, mode)
+        if S > 1:
+            yield (M, L, Np, R, nSamp, OS, 1, mode)
+        if mode != 'serial':
+            yield (M, L, Np, R, nSamp, OS, S, 'serial')
+
+    changed = True
+    while changed:
+        changed = False
+        for c in candidates(*cfg):
+            if not is_legal(*c):
+                continue
+            e = check_config(*c)
+            if e:
+                cfg, errs = c, e
+                changed = True
+                break
+    return (cfg, errs)
+
+
+def fuzz(seed=0, batches=16, batch_size=50, workers=None, max_samp=64, shrink_fails=True):
+    """
+    Runs batches of random configurations in parallel. Returns a dictionary
+    with the number of configurations checked and the failures. Every
+    failure records the batch seed, the configuration, its violations and
+    (with shrink_fails) the shrunk configuration.
+    """
+    seeds = [seed + b for b in range(batches)]
+    if workers == 1:
+        results = [run_batch(s, batch_size, max_samp) for s in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run_batch, seeds, [batch_size]*batches, [max_samp]*batches))
+
+    checked = 0
+    fails = []
+    shrunk = {}
+    for s, (n, f) in zip(seeds, results):
+        checked += n
+        for cfg, errs in f:
+            fail = {'seed': s, 'config': cfg, 'errors': errs}
+            if shrink_fails:
+                if cfg not in shrunk:
+                    shrunk[cfg] = shrink(cfg)
+                fail['shrunk'], fail['shrunk_errors'] = shrunk[cfg]
+            fails.append(fail)
+
+    return {'checked': checked, 'fails': fails}
+
+
+def main(seed=0, batches=16, batch_size=50, workers=None, max_samp=64):
+    import time
+
+    t0 = time.perf_counter()
+    res = fuzz(seed, batches, batch_size, workers, max_samp)
+    t = time.perf_counter() - t0
+
+    print("Checked ", res['checked'], " configurations in ", round(t, 2), " s (", round(60 * res['checked'] / t), " per minute)")
+    print("Failures: ", len(res['fails']))
+
+    # One line per distinct minimal configuration
+    seen = set()
+    for f in res['fails']:
+        key = tuple(f['shrunk']) if 'shrunk' in f else tuple(f['config'])
+        if key in seen:
+            continue
+        seen.add(key)
+        M, L, Np, R, nSamp, OS, S, mode = key
+        print("  seed ", f['seed'], " config ", tuple(f['config']), " -> minimal M=", M, " L=", L, " Np=", Np, " R=", R,
+              " nSamp=", nSamp, " OS=", OS, " S=", S, " mode=", mode)
+        for e in f.get('shrunk_errors', f['errors'])[:3]:
+            print("      ", e)
+
+    return res
+
+
+if __name__ == "__main__":
+    main()
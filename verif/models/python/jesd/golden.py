@@ -0,0 +1,243 @@
+## Description:
+## Golden store for lane streams. For every configuration the store keeps a
+## compact signature of each lane stream instead of the spreadsheets:
+##
+##   words      lane words emitted per chunk of cycles
+##   digests    64 bit blake2b digest of the lane rows per chunk
+##   rows       16 bit hash of every lane row (zlib + base64)
+##
+## Configurations run on one of two engines:
+##   lseq       s2w + lseq_v2 on nibble labels (get_lane_map, with OS/S)
+##   datapath   numeric data path on random samples (datapath.py)
+##
+## The diff runs the current code chunk by chunk, carrying the sequencer
+## state (and random generator state) and keeping it at every chunk start.
+## Only the digests are compared on this pass. Chunks that mismatch are
+## run again from their saved state with per row hashes, which gives the
+## first differing cycle and lane.
+##
+## Usage:
+##   python3 -m jesd golden record --store golden.json
+##   python3 -m jesd golden diff --store golden.json
+
+import base64
+import hashlib
+import json
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .checkpoint import get_map_configs, save_checkpoint
+from .datapath import gen_conv_data, get_nibble_rows, map_cw_2_ng, map_s_2_cw
+from .tl_2_dl_mapping import (get_num_cycles, get_sample_pattern, get_strb_masks, get_strb_window,
+                              lseq_v2, map_samples, new_lseq_state)
+
+# Cycles per chunk
+chunk_cycles = 64
+
+
+def get_key(cfg):
+    """
+    Returns the store key of a configuration, e.g.
+    'lseq M=8 L=16 Np=16 R=1 nSamp=64 OS=1 S=1'.
+    """
+    return cfg['engine'] + ' ' + ' '.join(k + '=' + str(v) for k, v in cfg.items() if k != 'engine')
+
+
+def lseq_config(M, L, Np, R, nSamp, OS=1, S=1):
+    return {'engine': 'lseq', 'M': M, 'L': L, 'Np': Np, 'R': R, 'nSamp': nSamp, 'OS': OS, 'S': S}
+
+
+def datapath_config(M, L, Np, R, nSamp, N=16, CS=0, CF=0, seed=0):
+    return {'engine': 'datapath', 'M': M, 'L': L, 'Np': Np, 'R': R, 'nSamp': nSamp,
+            'N': N, 'CS': CS, 'CF': CF, 'seed': seed}
+
+
+def get_default_configs(nSamp=64):
+    """
+    Every lseq configuration with OS = S = 1 whose converter bus splits
+    evenly across the lanes, and a datapath configuration per rate.
+    """
+    cfgs = [lseq_config(M, L, Np, R, n) for M, L, Np, R, n, os_, s in get_map_configs(nSamp, OS=(1,), S=(1,))]
+    cfgs += [datapath_config(8, 8, 16, R, nSamp * 16, 12, 4) for R in (1, 2, 3, 4, 6, 8)]
+    return cfgs
+
+
+class Engine:
+    """
+    Runs a configuration chunk by chunk. The state (sequencer and random
+    generator) is a JSON style dictionary so it can be copied and used to
+    run a chunk again.
+    """
+
+    def __init__(self, cfg):
+        self.cfg = cfg
+        c = cfg
+        self.L = c['L']
+        self.cycles = get_num_cycles(c['nSamp'], c['R'])
+        if c['engine'] == 'lseq':
+            # Nibble labels are cheap, prepare all rows once
+            rows = get_sample_pattern(c['nSamp'], c['M'], c['R'], c['Np'])
+            masks = get_strb_masks(c['nSamp'], c['R'])
+            if c['OS'] > 1 or c['S'] > 1:
+                rows, masks = map_samples(rows, masks, c['M'], c['Np'], c['OS'], c['S'])
+            self.rows = rows
+            self.masks = masks
+
+    def start(self):
+        state = {'lseq': new_lseq_state(self.L)}
+        if self.cfg['engine'] == 'datapath':
+            state['rng'] = np.random.default_rng(self.cfg['seed']).bit_generator.state
+        return state
+
+    def run(self, c0, c1, state):
+        """
+        Runs cycles c0 up to c1 from state (updated in place) and returns
+        the lane rows.
+        """
+        c = self.cfg
+        if c['engine'] == 'lseq':
+            rows = self.rows[c0:c1]
+            masks = tuple(m[c0:c1] for m in self.masks)
+        else:
+            rng = np.random.default_rng()
+            rng.bit_generator.state = state['rng']
+            masks = get_strb_window(c['R'], c0, c1)
+            data, valid = gen_conv_data(None, c['M'], c['R'], c['N'], rng, masks)
+            ctrl = rng.integers(0, 1 << c['CS'], size=data.shape)
+            cw, cfw = map_s_2_cw(data, valid, ctrl, c['N'], c['CS'], c['CF'], c['Np'])
+            rows = get_nibble_rows(np.concatenate([map_cw_2_ng(cw, c['Np']), cfw], axis=2), c['Np'])
+            state['rng'] = rng.bit_generator.state
+        return lseq_v2(rows, self.L, c['M'], c['R'], verbose=False, masks=masks, state=state['lseq'], mode='lanes')
+
+
+def row_text(w):
+    return ' '.join(str(n) for n in w)
+
+
+def chunk_signature(rows):
+    """
+    Returns (words, digest) of the rows of one lane in one chunk.
+    """
+    words = sum(1 for w in rows if 'x' not in w)
+    digest = hashlib.blake2b('\n'.join(row_text(w) for w in rows).encode(), digest_size=8).hexdigest()
+    return (words, digest)
+
+
+def row_hashes(rows):
+    """
+    16 bit hash (crc32 LSBs) of every row.
+    """
+    return np.array([zlib.crc32(row_text(w).encode()) & 0xFFFF for w in rows], dtype=np.uint16)
+
+
+def pack_hashes(h):
+    return base64.b64encode(zlib.compress(h.astype('<u2').tobytes(), 9)).decode()
+
+
+def unpack_hashes(s):
+    return np.frombuffer(zlib.decompress(base64.b64decode(s)), dtype='<u2')
+
+
+def record_config(cfg, chunk=chunk_cycles):
+    """
+    Runs a configuration and returns its signature.
+    """
+    eng = Engine(cfg)
+    state = eng.start()
+    lanes = [{'words': [], 'digests': [], 'rows': []} for l in range(eng.L)]
+    for c0 in range(0, eng.cycles, chunk):
+        out = eng.run(c0, min(c0 + chunk, eng.cycles), state)
+        for l in range(eng.L):
+            words, digest = chunk_signature(out[l])
+            lanes[l]['words'].append(words)
+            lanes[l]['digests'].append(digest)
+            lanes[l]['rows'].append(row_hashes(out[l]))
+    for s in lanes:
+        s['rows'] = pack_hashes(np.concatenate(s['rows']) if s['rows'] else np.zeros(0, dtype=np.uint16))
+    return {'config': cfg, 'cycles': eng.cycles, 'lanes': lanes}
+
+
+def diff_config(golden, chunk=chunk_cycles):
+    """
+    Runs the configuration of a golden signature with the current code and
+    compares. Returns None if it matches, otherwise a dictionary with the
+    first differing cycle and lane, the number of mismatching chunks and
+    the lane words of golden and new.
+    """
+    cfg = golden['config']
+    eng = Engine(cfg)
+    if eng.cycles != golden['cycles']:
+        return {'key': get_key(cfg), 'reason': 'cycles', 'golden': golden['cycles'], 'new': eng.cycles}
+
+    # Digest pass. Keep the state at the start of every chunk.
+    state = eng.start()
+    starts = []
+    bad = []
+    bad_lanes = [set() for l in range(eng.L)]
+    words = [0] * eng.L
+    for i, c0 in enumerate(range(0, eng.cycles, chunk)):
+        starts.append(json.loads(json.dumps(state)))
+        out = eng.run(c0, min(c0 + chunk, eng.cycles), state)
+        for l in range(eng.L):
+            w, d = chunk_signature(out[l])
+            words[l] += w
+            g = golden['lanes'][l]
+            if (w, d) != (g['words'][i], g['digests'][i]):
+                bad.append(i)
+                bad_lanes[l].add(i)
+    if not bad:
+        return None
+
+    # Run the first mismatching chunk again from its state, row by row
+    i = min(bad)
+    c0 = i * chunk
+    c1 = min(c0 + chunk, eng.cycles)
+    out = eng.run(c0, c1, starts[i])
+    # A 16 bit collision leaves the chunk start as the best guess
+    first = (c0, min(l for l in range(eng.L) if i in bad_lanes[l]))
+    found = False
+    for l in range(eng.L):
+        new = row_hashes(out[l])
+        old = unpack_hashes(golden['lanes'][l]['rows'])[c0:c1]
+        diff = np.flatnonzero(new != old)
+        if diff.size and (not found or c0 + int(diff[0]) < first[0]):
+            first = (c0 + int(diff[0]), l)
+            found = True
+
+    return {'key': get_key(cfg), 'reason': 'lanes', 'cycle': first[0], 'lane': first[1],
+            'chunks': len(set(bad)), 'golden_words': [sum(g['words']) for g in golden['lanes']],
+            'new_words': words}
+
+
+def _map(fn, items, workers):
+    if workers == 1:
+        return [fn(x) for x in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, items, chunksize=max(1, len(items) // 64)))
+
+
+def record(path, configs=None, workers=None):
+    """
+    Records the signatures of configs (get_default_configs if None) to the
+    store at path.
+    """
+    if configs is None:
+        configs = get_default_configs()
+    sigs = _map(record_config, configs, workers)
+    store = {'chunk': chunk_cycles, 'configs': {get_key(s['config']): s for s in sigs}}
+    save_checkpoint(path, store)
+    return store
+
+
+def diff(path, workers=None):
+    """
+    Compares the current code against the store at path. Returns the list
+    of differences (see diff_config).
+    """
+    with open(path) as f:
+        store = json.load(f)
+    assert store['chunk'] == chunk_cycles, "Store was recorded with a different chunk size"
+    res = _map(diff_config, list(store['configs'].values()), workers)
+    return [r for r in res if r is not None]
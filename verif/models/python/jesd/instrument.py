@@ -0,0 +1,204 @@
+## Description:
+## Light weight instrumentation for the model pipeline (S2W -> LSEQ ->
+## writers). Stages are timed with the stage context manager or the timed
+## decorator, and the models bump counters (rows generated, nibbles moved,
+## words emitted, cells written). Optionally each stage also runs under
+## cProfile and/or tracemalloc.
+##
+## Instrumentation is off by default and then costs one flag check per
+## stage. Turn it on with the JESD_PROFILE environment variable or with
+## enable(). JESD_PROFILE is a comma separated list of:
+##   1 | timers     stage timers and counters
+##   cprofile       cProfile per stage (implies timers)
+##   tracemalloc    peak memory per stage, above the traced memory at the
+##                  start of the stage (implies timers)
+## e.g.  JESD_PROFILE=timers,tracemalloc python3 -m jesd map
+##
+## When turned on through JESD_PROFILE the summary is printed when the
+## process exits. Otherwise call report().
+
+import atexit
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import time
+import tracemalloc as tm
+
+# Module state. Everything below only runs when enabled is True.
+enabled = False
+use_cprofile = False
+use_tracemalloc = False
+
+stages = {}     # name -> {'calls', 'time', 'self', 'peak'}
+counters = {}   # name -> count
+profiles = {}   # name -> cProfile.Profile
+
+_active = []    # stack of stages that are currently running. Time spent in
+                # a nested stage is also subtracted from the self time of
+                # the stage around it.
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_null = _NullStage()
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        st = stages.setdefault(self.name, {'calls': 0, 'time': 0.0, 'self': 0.0, 'peak': 0})
+        st['calls'] += 1
+
+        # Nested stages: the profiler of the outer stage is paused so that
+        # every function call is only attributed to the innermost stage.
+        if use_cprofile:
+            if _active:
+                profiles[_active[-1].name].disable()
+            profiles.setdefault(self.name, cProfile.Profile()).enable()
+        # The peak is in absolute traced memory until the stage exits. The
+        # outer stage keeps the peak it reached so far before the reset.
+        self.base = 0
+        self.peak = 0
+        if use_tracemalloc:
+            cur, peak = tm.get_traced_memory()
+            if _active:
+                _active[-1].peak = max(_active[-1].peak, peak)
+            tm.reset_peak()
+            self.base = cur
+            self.peak = cur
+        _active.append(self)
+        self.child = 0.0
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        t = time.perf_counter() - self.t0
+        st = stages[self.name]
+        st['time'] += t
+        st['self'] += t - self.child
+        _active.pop()
+        if use_tracemalloc:
+            # A nested stage resets the peak, so it hands its peak up
+            self.peak = max(self.peak, tm.get_traced_memory()[1])
+            st['peak'] = max(st['peak'], self.peak - self.base)
+        if _active:
+            _active[-1].child += t
+            _active[-1].peak = max(_active[-1].peak, self.peak)
+        if use_cprofile:
+            profiles[self.name].disable()
+            if _active:
+                profiles[_active[-1].name].enable()
+        return False
+
+
+def stage(name):
+    """
+    Context manager that times the enclosed block as stage name.
+    """
+    if not enabled:
+        return _null
+    return _Stage(name)
+
+
+def timed(name):
+    """
+    Decorator that times every call of the decorated function as stage
+    name.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return fn(*args, **kwargs)
+            with _Stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def count(name, n=1):
+    """
+    Adds n to counter name.
+    """
+    if enabled:
+        counters[name] = counters.get(name, 0) + n
+
+
+def enable(timers=True, cprofile=False, tracemalloc=False):
+    """
+    Turns instrumentation on (or off with timers=False). cprofile and
+    tracemalloc add per stage profiles and memory peaks.
+    """
+    global enabled, use_cprofile, use_tracemalloc
+    enabled = bool(timers or cprofile or tracemalloc)
+    use_cprofile = enabled and cprofile
+    use_tracemalloc = enabled and tracemalloc
+    if use_tracemalloc and not tm.is_tracing():
+        tm.start()
+
+
+def reset():
+    """
+    Clears all timers, counters and profiles.
+    """
+    stages.clear()
+    counters.clear()
+    profiles.clear()
+
+
+def summary():
+    """
+    Returns the collected data as a dictionary.
+    """
+    return {
+        'stages'   : {k: dict(v) for k, v in stages.items()},
+        'counters' : dict(counters),
+    }
+
+
+def report(file=None, top=10):
+    """
+    Prints the stage timers, counters and (if enabled) the top functions
+    of every stage profile.
+    """
+    if file is None:
+        file = sys.stdout
+    if not stages and not counters:
+        return
+
+    print(" ***************** PROFILE SUMMARY *****************", file=file)
+    print("============= Stages", file=file)
+    print("{:<24} {:>8} {:>12} {:>12} {:>12} {:>12}".format('Stage', 'Calls', 'Total (s)', 'Self (s)', 'Mean (ms)', 'Peak (KB)'), file=file)
+    for name, st in sorted(stages.items(), key=lambda s: -s[1]['self']):
+        peak = str(st['peak'] // 1024) if use_tracemalloc else '-'
+        print("{:<24} {:>8} {:>12.6f} {:>12.6f} {:>12.3f} {:>12}".format(
+            name, st['calls'], st['time'], st['self'], 1000 * st['time'] / st['calls'], peak), file=file)
+
+    if counters:
+        print("============= Counters", file=file)
+        for name, n in counters.items():
+            print("{:<24} {:>12}".format(name, n), file=file)
+
+    for name, prof in profiles.items():
+        print("============= Profile: ", name, file=file)
+        s = io.StringIO()
+        pstats.Stats(prof, stream=s).sort_stats('cumulative').print_stats(top)
+        print(s.getvalue(), file=file)
+
+
+# Pick up the environment variable when the module is first imported
+_env = [x.strip().lower() for x in os.environ.get('JESD_PROFILE', '').split(',') if x.strip()]
+if _env and _env != ['0']:
+    enable(timers=True, cprofile='cprofile' in _env, tracemalloc='tracemalloc' in _env)
+    atexit.register(report)
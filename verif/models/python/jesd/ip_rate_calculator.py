@@ -1,6 +1,7 @@
 ## Created By: Sai Mohan Kilambi
 ## Description:
 ## This script calculates the rate of JESD204C lanes
+## (or JESD204B lanes with mode='204B', 8b/10b encoding)
 ## for various values of N', M, L and Fs. Below are
 ## the possible values for each of these variables
 ## N' =  {16, 24, 48}
@@ -14,10 +15,6 @@
 ## in rates that are not in the allowed lane rate then 
 ## skip the combination.
 
-from constraint import *
-import numpy as np
-import xlsxwriter as xls
-
 def add_xls_sheet_header(wb, ws, xls_row_idx, xls_col_idx):
     
 
@@ -146,64 +143,114 @@ def add_row(wb, ws, xls_row_idx, xls_col_idx, npr, m, l, fs, lane_rate, os, s):
     xls_col_idx = xls_col_idx + 1
     
 
-if __name__ == "__main__":
-    
-    # Variables that dictate the table creation
-    
-    # Encoding Rate
-    enc_rate = 66/64
-    
-    #Number of converters
-    #M = [2, 4, 8, 16]
-    M = [2, 4, 8, 16]
-    
-    # Number of SERDES lanes (this should be a list of possible Lane configurations)
-    #L = [2, 4, 8, 16]
-    L = [1, 2, 4, 8]
-    
-    # Fixed bit width 
-    N_prime = [12, 16, 24, 32, 48] #bits
-    
-    # Sample rates
-    #Fs = 122.88*[1, 2, 4, 6, 8]
-    Fs = [122.88, 245.76, 491.52, 737.28, 983.04]
-   
-    # Accepted Lane Rates
-    lr = [8.11008, 12.16512, 16.22016, 24.33024, 32.44032]
-    
-    # Sample Repeat - Which means you repeat the same sample
-    # twice. You can think of this as the converter having a
-    # digital Twin.
-    OS = [1, 2]
-    S = [1, 2]
-    
-    # XLSX workbook
-    xls_row_idx = 5
-    xls_col_idx = 5
-    wb = xls.Workbook('JESD_Rates.xlsx')
-    ws = wb.add_worksheet('Rates')
-    
-    add_xls_sheet_header(wb, ws, xls_row_idx, xls_col_idx)
-   
-    xls_row_idx = xls_row_idx + 2 
-    for np in N_prime:
+# Encoding Rate
+enc_rate = 66/64
+
+# Accepted Lane Rates
+lr = [8.11008, 12.16512, 16.22016, 24.33024, 32.44032]
+
+# JESD204B: 8b/10b encoding and the accepted lane rates up to the
+# 12.5 Gbps limit of JESD204B
+enc_rate_b = 10/8
+lr_b = [2.4576, 3.6864, 4.9152, 6.144, 7.3728, 9.8304, 12.288]
+
+def get_link_mode(mode):
+    """
+    Returns the (encoding rate, accepted lane rates) of a link mode,
+    '204C' (64b/66b) or '204B' (8b/10b).
+    """
+    match mode:
+        case '204C':
+            return (enc_rate, lr)
+        case '204B':
+            return (enc_rate_b, lr_b)
+    raise ValueError("mode should be '204C' or '204B'")
+
+def get_rates(N_prime, L, M, Fs, OS, S, feasible_only=True, mode='204C', verbose=False):
+    """
+    This function runs the rate sweep over every combination of N', L, M,
+    Fs, OS and S and returns the combinations as a list of tuples. Each
+    tuple is (N', L, M, Fs, OS, S, lane rate, F). With feasible_only set
+    only the combinations whose lane rate is in the accepted lane rates and
+    whose F is an integer are returned.
+
+    Parameters:
+    -----------
+        N_prime:        List of N' (bits)
+        L:              List of lane counts
+        M:              List of converter counts
+        Fs:             List of sample rates (MSps)
+        OS:             List of sample repeat values
+        S:              List of oversampling values
+        feasible_only:  Only return rows that would go into the sheet
+        mode:           Link mode, '204C' or '204B' (see get_link_mode)
+        verbose:        Print every swept combination, including the S=2
+                        ones that are skipped
+    """
+    enc, lrs = get_link_mode(mode)
+    rows = []
+    for npr in N_prime:
         for l in L:
             for m in M:
                 for fs in Fs:
                     for os in OS:
                         for s in S: 
-                            lane_rate = round((m * os * np * fs * enc_rate) / (l * 1000), 5) # 5 is resolution.
-                            print("N': ", np, "bits, M: ", m, ", Lanes: ", l, ", Fs: ", fs, "MSps, Lane Rate: ", lane_rate, " Gbps, OS: ", os, " S: ", s)  
-                            F = (m*s*np/8/l)
+                            lane_rate = round((m * os * npr * fs * enc) / (l * 1000), 5) # 5 is resolution.
+                            if verbose:
+                                print("N': ", npr, "bits, M: ", m, ", Lanes: ", l, ", Fs: ", fs, "MSps, Lane Rate: ", lane_rate, " Gbps, OS: ", os, " S: ", s)  
+                            F = (m*s*npr/8/l)
                             
                             # You want to break if S=2 is integer but S=1 was also an integer
-                            F1 = (m*np/8/l)
+                            F1 = (m*npr/8/l)
                             if s == 2 and F1.is_integer():
                                 break
-                            #print("N': ", np, "bits, M: ", m, ", Lanes: ", l, ", Fs: ", fs, "MSps, Lane Rate: ", lane_rate, " Gbps")  
-                            if lane_rate in lr and F.is_integer():
-                                add_row(wb, ws, xls_row_idx, xls_col_idx, np, m, l, fs, lane_rate, os, s)
-                                #print("N': ", np, "bits, M: ", m, ", Lanes: ", l, ", Fs: ", fs, "MSps, Lane Rate: ", lane_rate, " Gbps")  
-                                xls_row_idx = xls_row_idx+1        
+                            if not feasible_only or (lane_rate in lrs and F.is_integer()):
+                                rows.append((npr, l, m, fs, os, s, lane_rate, F))
+    return rows
+
+# The sweep used for JESD_Rates.xlsx
+def main(book_name='JESD_Rates.xlsx',
+         N_prime=[12, 16, 24, 32, 48],
+         L=[1, 2, 4, 8],
+         M=[2, 4, 8, 16],
+         Fs=[122.88, 245.76, 491.52, 737.28, 983.04],
+         OS=[1, 2],
+         S=[1, 2],
+         mode='204C'):
+    """
+    Runs the rate sweep and writes every feasible combination to an excel
+    sheet.
+
+    Parameters:
+    -----------
+        book_name:  Name of the xlsx workbook
+        N_prime:    Fixed bit widths (bits)
+        L:          Number of SERDES lanes (this should be a list of possible Lane configurations)
+        M:          Number of converters
+        Fs:         Sample rates (122.88 x {1, 2, 4, 6, 8})
+        OS:         Sample Repeat - Which means you repeat the same sample
+                    twice. You can think of this as the converter having a
+                    digital Twin.
+        S:          Oversampling
+        mode:       Link mode, '204C' or '204B'
+    """
+    import xlsxwriter as xls
+    
+    # XLSX workbook
+    xls_row_idx = 5
+    xls_col_idx = 5
+    wb = xls.Workbook(book_name)
+    ws = wb.add_worksheet('Rates')
+    
+    add_xls_sheet_header(wb, ws, xls_row_idx, xls_col_idx)
+   
+    xls_row_idx = xls_row_idx + 2 
+    for npr, l, m, fs, os, s, lane_rate, F in get_rates(N_prime, L, M, Fs, OS, S, mode=mode, verbose=True):
+        add_row(wb, ws, xls_row_idx, xls_col_idx, npr, m, l, fs, lane_rate, os, s)
+        xls_row_idx = xls_row_idx+1        
                     
     wb.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+## Description:
+## JESD204B link layer on arrays of lane octets. Where JESD204C lanes
+## carry 64b/66b blocks, JESD204B lanes carry 8b/10b code groups:
+##
+##   get_lane_octets    lane words of lseq_v2 / lseq_lane_words to octets
+##   insert_ctrl_chars  /F/ and /A/ character replacement at the end of
+##                      frames and multiframes
+##   get_ilas_config    link configuration octets of the ILAS
+##   get_ilas           initial lane alignment sequence (4 multiframes)
+##   encode_8b10b       table driven 8b/10b encoder with running disparity
+##   get_link_stream    CGS + ILAS + user data, encoded
+##
+## Arrays are [lanes, octets], every lane keeps its own running disparity.
+## Code groups are 10 bit values abcdei fghj with bit a (sent first) as the
+## MSB, so K28.5 at RD- is 0b0011111010.
+##
+## The encoder tables are built once from the 5b/6b and 3b/4b sub-block
+## tables. Whether a code group flips the running disparity only depends
+## on the octet (and K flag), not on the running disparity it starts at.
+## The running disparity in front of every octet is therefore the initial
+## one XOR the parity of the flips before it (a cumulative sum), after
+## which every octet is a table lookup.
+##
+## Control characters:
+##   /K/ K28.5  code group synchronization
+##   /R/ K28.0  start of an ILAS multiframe
+##   /A/ K28.3  end of a multiframe (lane alignment)
+##   /Q/ K28.4  start of the link configuration data
+##   /F/ K28.7  end of a frame (frame alignment)
+
+import numpy as np
+
+# 5b/6b sub-block (abcdei) of EDCBA at RD-. None means the RD+ code is the
+# complement, otherwise it is the given code.
+code_5b6b = [
+    ('100111', None), ('011101', None), ('101101', None), ('110001', '110001'),
+    ('110101', None), ('101001', '101001'), ('011001', '011001'), ('111000', '000111'),
+    ('111001', None), ('100101', '100101'), ('010101', '010101'), ('110100', '110100'),
+    ('001101', '001101'), ('101100', '101100'), ('011100', '011100'), ('010111', None),
+    ('011011', None), ('100011', '100011'), ('010011', '010011'), ('110010', '110010'),
+    ('001011', '001011'), ('101010', '101010'), ('011010', '011010'), ('111010', None),
+    ('110011', None), ('100110', '100110'), ('010110', '010110'), ('110110', None),
+    ('001110', '001110'), ('101110', None), ('011110', None), ('101011', None),
+]
+code_k28_6b = '001111'
+
+# 3b/4b sub-block (fghj) of HGF at RD- and RD+, data and control
+code_3b4b = [('1011', '0100'), ('1001', '1001'), ('0101', '0101'), ('1100', '0011'),
+             ('1101', '0010'), ('1010', '1010'), ('0110', '0110'), ('1110', '0001')]
+code_3b4b_a7 = ('0111', '1000')
+code_3b4b_k = [('1011', '0100'), ('0110', '1001'), ('1010', '0101'), ('1100', '0011'),
+               ('1101', '0010'), ('0101', '1010'), ('1001', '0110'), ('0111', '1000')]
+
+# Valid control characters
+k_chars = [0x1C, 0x3C, 0x5C, 0x7C, 0x9C, 0xBC, 0xDC, 0xFC, 0xF7, 0xFB, 0xFD, 0xFE]
+
+K28_0 = 0x1C    # /R/
+K28_3 = 0x7C    # /A/
+K28_4 = 0x9C    # /Q/
+K28_5 = 0xBC    # /K/
+K28_7 = 0xFC    # /F/
+
+
+def invert(code):
+    return ''.join('1' if b == '0' else '0' for b in code)
+
+
+def disparity(code):
+    return 2 * code.count('1') - len(code)
+
+
+def encode_symbol(octet, k, rd):
+    """
+    Encodes one octet. Returns the 10 bit code group and the running
+    disparity after it (0: RD-, 1: RD+), or None for an invalid control
+    character.
+    Parameters:
+    -----------
+        octet:  Octet HGFEDCBA
+        k:      Control character
+        rd:     Running disparity in front of the octet (0: RD-, 1: RD+)
+    """
+    if k and octet not in k_chars:
+        return None
+    x = octet & 0x1F
+    y = octet >> 5
+
+    if k and x == 28:
+        c6 = code_k28_6b if rd == 0 else invert(code_k28_6b)
+    else:
+        neg, pos = code_5b6b[x]
+        c6 = neg if rd == 0 else (pos if pos is not None else invert(neg))
+    if disparity(c6) != 0:
+        rd = 1 - rd
+
+    if k:
+        c4 = code_3b4b_k[y][rd]
+    elif y == 7 and ((rd == 0 and x in (17, 18, 20)) or (rd == 1 and x in (11, 13, 14))):
+        c4 = code_3b4b_a7[rd]
+    else:
+        c4 = code_3b4b[y][rd]
+    if disparity(c4) != 0:
+        rd = 1 - rd
+
+    return (int(c6 + c4, 2), rd)
+
+
+def get_8b10b_tables():
+    """
+    Returns the code groups [2, 512] (running disparity, K x 256 + octet),
+    the running disparity flip of every octet [512] and the valid flags
+    [512] (False for invalid control characters).
+    """
+    codes = np.zeros((2, 512), dtype=np.uint16)
+    flips = np.zeros(512, dtype=np.uint8)
+    valid = np.zeros(512, dtype=bool)
+    for k in range(2):
+        for octet in range(256):
+            i = 256 * k + octet
+            res = [encode_symbol(octet, k, rd) for rd in range(2)]
+            if res[0] is None:
+                continue
+            codes[:, i] = [r[0] for r in res]
+            flips[i] = res[0][1]
+            assert res[1][1] == 1 - flips[i], "Running disparity flip depends on the running disparity"
+            valid[i] = True
+    return (codes, flips, valid)
+
+
+code_tab, flip_tab, valid_tab = get_8b10b_tables()
+
+
+def encode_8b10b(octets, ctrl=None, rd=0):
+    """
+    Encodes the octets of every lane. Returns the code groups (uint16, same
+    shape as octets) and the running disparity at the end of every lane.
+    Parameters:
+    -----------
+        octets: Octets [lanes, octets] (or [octets] for one lane)
+        ctrl:   Control character flags, same shape as octets
+        rd:     Running disparity at the start, per lane or for all
+                lanes (0: RD-, 1: RD+)
+    """
+    octets = np.asarray(octets, dtype=np.uint8)
+    idx = octets.astype(np.intp)
+    if ctrl is not None:
+        idx = idx + 256 * np.asarray(ctrl, dtype=np.intp)
+    if not valid_tab[idx].all():
+        bad = np.flatnonzero(~valid_tab[idx].ravel())[0]
+        raise ValueError("Invalid control character " + hex(int(octets.ravel()[bad])))
+
+    # Running disparity in front of every octet
+    flips = flip_tab[idx]
+    rd0 = np.asarray(rd, dtype=np.uint8)[..., None]
+    cum = np.cumsum(flips, axis=-1, dtype=np.uint8) & 1
+    rds = rd0 ^ cum ^ flips
+    codes = code_tab[rds, idx]
+    rd_out = (rd0 ^ cum[..., -1:])[..., 0] if octets.shape[-1] else rd0[..., 0]
+    return (codes, rd_out)
+
+
+def get_lane_octets(words):
+    """
+    Splits the 64 bit lane words of every lane (see get_lane_words or
+    lseq_lane_words) into octets in transmission order. The first nibble
+    of a word is at its LSBs and is the high nibble of the first octet.
+    Parameters:
+    -----------
+        words:  64 bit lane words [lanes, words]
+    """
+    words = np.asarray(words, dtype=np.uint64)
+    shifts = 4 * np.arange(16, dtype=np.uint64)
+    nibs = ((words[..., None] >> shifts) & np.uint64(0xF)).astype(np.uint8)
+    nibs = nibs.reshape(words.shape + (8, 2))
+    return ((nibs[..., 0] << 4) | nibs[..., 1]).reshape(words.shape[:-1] + (-1,))
+
+
+def insert_ctrl_chars(octets, F, K, scrambled=False):
+    """
+    Character replacement of the user data. Returns the octets and the
+    control character flags.
+
+    Without scrambling the last octet of a frame is replaced by /A/ at the
+    end of a multiframe and by /F/ otherwise when it equals the last octet
+    of the previous frame. /F/ is not used if the previous frame already
+    ended with a control character. With scrambling the last octet of a
+    frame is replaced by /F/ if it is 0xFC, and by /A/ at the end of a
+    multiframe if it is 0x7C.
+    Parameters:
+    -----------
+        octets:     User data octets [lanes, octets], starting at a
+                    multiframe and a whole number of frames
+        F:          Octets per frame
+        K:          Frames per multiframe
+        scrambled:  Octets are scrambled
+    """
+    octets = np.array(octets, dtype=np.uint8)
+    assert octets.shape[-1] % F == 0, "User data should be a whole number of frames"
+    ctrl = np.zeros(octets.shape, dtype=bool)
+    last = octets[..., F - 1::F]
+    nf = last.shape[-1]
+    end_mf = (np.arange(nf) % K) == K - 1
+
+    if scrambled:
+        rep_a = end_mf & (last == K28_3)
+        rep_f = ~end_mf & (last == K28_7)
+    else:
+        eq = np.zeros(last.shape, dtype=bool)
+        eq[..., 1:] = last[..., 1:] == last[..., :-1]
+        rep_a = eq & end_mf
+        # /F/ is skipped after a replaced frame, so in a run of equal
+        # frames the replacements alternate. Every frame that is not
+        # equal (not replaced) or /A/ (replaced) restarts the pattern.
+        anchor = ~eq | rep_a
+        pos = np.arange(nf)
+        a = np.maximum.accumulate(np.where(anchor, pos, 0), axis=-1)
+        rep_f = eq & ~end_mf & (np.take_along_axis(rep_a, a, axis=-1) ^ ((pos - a) & 1).astype(bool))
+
+    last[rep_a] = K28_3
+    last[rep_f] = K28_7
+    octets[..., F - 1::F] = last
+    ctrl[..., F - 1::F] = rep_a | rep_f
+    return (octets, ctrl)
+
+
+def get_ilas_config(L, M, F, K, N, Np, S=1, CS=0, CF=0, HD=0, SCR=0, DID=0, BID=0, subclass=1, jesdv=1):
+    """
+    Returns the 14 link configuration octets of every lane [L, 14] (uint8)
+    that the second ILAS multiframe carries. Lanes only differ in LID and
+    FCHK. FCHK is the sum of the fields modulo 256.
+    Parameters:
+    -----------
+        L:          Number of lanes
+        M:          Number of converters
+        F:          Octets per frame
+        K:          Frames per multiframe
+        N:          Converter resolution in bits
+        Np:         Precision in bits (N')
+        S:          Samples per converter per frame
+        CS:         Control bits per sample
+        CF:         Control words per frame
+        HD:         High density format
+        SCR:        Scrambling enabled
+        DID:        Device ID
+        BID:        Bank ID
+        subclass:   Device subclass
+        jesdv:      JESD204 version (1: JESD204B)
+    """
+    assert 1 <= L <= 32, "L should be in the range: [1, 32]"
+    assert 1 <= F <= 256 and 1 <= K <= 32 and 1 <= M <= 256, "F, K or M out of range"
+    assert 1 <= N <= 32 and 1 <= Np <= 32 and 1 <= S <= 32, "N, N' or S out of range"
+    assert CS <= 3 and CF <= 31, "CS or CF out of range"
+    assert F * K >= 17, "A multiframe should have at least 17 octets (F x K)"
+
+    fields = [DID, BID, SCR, L - 1, F - 1, K - 1, M - 1, CS, N - 1, subclass, Np - 1, jesdv, S - 1, HD, CF]
+    cfg = np.zeros((L, 14), dtype=np.uint8)
+    cfg[:, 0] = DID
+    cfg[:, 1] = BID & 0xF
+    cfg[:, 2] = np.arange(L)
+    cfg[:, 3] = (SCR << 7) | (L - 1)
+    cfg[:, 4] = F - 1
+    cfg[:, 5] = K - 1
+    cfg[:, 6] = M - 1
+    cfg[:, 7] = (CS << 6) | (N - 1)
+    cfg[:, 8] = (subclass << 5) | (Np - 1)
+    cfg[:, 9] = (jesdv << 5) | (S - 1)
+    cfg[:, 10] = (HD << 7) | CF
+    cfg[:, 13] = (sum(fields) + np.arange(L)) & 0xFF
+    return cfg
+
+
+def get_ilas(config, F, K, multiframes=4):
+    """
+    Returns the ILAS octets [L, multiframes x K x F] and their control
+    character flags. Every multiframe starts with /R/ and ends with /A/,
+    the second one carries /Q/ and the link configuration after /R/. The
+    other octets are a ramp of the octet position in the multiframe.
+    Parameters:
+    -----------
+        config:         Link configuration octets [L, 14] (see
+                        get_ilas_config)
+        F:              Octets per frame
+        K:              Frames per multiframe
+        multiframes:    Number of multiframes
+    """
+    config = np.asarray(config, dtype=np.uint8)
+    L = config.shape[0]
+    n = F * K
+    assert multiframes >= 2, "The ILAS has at least 2 multiframes"
+    assert n >= 2 + config.shape[1] + 1, "Multiframe too short for the link configuration"
+
+    mf = np.tile((np.arange(n) & 0xFF).astype(np.uint8), (L, multiframes, 1))
+    ctrl = np.zeros(mf.shape, dtype=bool)
+    mf[:, :, 0] = K28_0
+    mf[:, :, -1] = K28_3
+    mf[:, 1, 1] = K28_4
+    mf[:, 1, 2:2 + config.shape[1]] = config
+    ctrl[:, :, [0, -1]] = True
+    ctrl[:, 1, 1] = True
+    return (mf.reshape(L, -1), ctrl.reshape(L, -1))
+
+
+def get_link_stream(data, config, F, K, cgs=None, multiframes=4, scrambled=False, rd=0):
+    """
+    Returns the code groups of every lane for a whole link start up: /K/
+    characters (code group synchronization), the ILAS and the user data
+    with character replacement. Also returns the running disparity at the
+    end of every lane.
+    Parameters:
+    -----------
+        data:           User data octets [L, octets] (see get_lane_octets)
+        config:         Link configuration octets (see get_ilas_config)
+        F:              Octets per frame
+        K:              Frames per multiframe
+        cgs:            Number of /K/ characters, one multiframe if None
+        multiframes:    Number of ILAS multiframes
+        scrambled:      data is scrambled
+        rd:             Running disparity at the start
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    L = data.shape[0]
+    if cgs is None:
+        cgs = F * K
+    ilas, ilas_ctrl = get_ilas(config, F, K, multiframes)
+    user, user_ctrl = insert_ctrl_chars(data, F, K, scrambled)
+    octets = np.concatenate([np.full((L, cgs), K28_5, dtype=np.uint8), ilas, user], axis=1)
+    ctrl = np.concatenate([np.ones((L, cgs), dtype=bool), ilas_ctrl, user_ctrl], axis=1)
+    return encode_8b10b(octets, ctrl, rd)
@@ -0,0 +1,433 @@
+## Created By: Sai Mohan Kilambi
+## Description:
+## This is a constraint solver that gets a list of CCs that meet a given 
+## constraint. So for instance if the constraint is that number of CCs should
+## add up to 100 MHz, then the solver will select a list of ccs that give
+## the total BW as 100 MHz.
+
+from functools import lru_cache
+import os
+import numpy as np
+
+from .ip_rate_calculator import get_link_mode
+
+# CC bandwidths (in MHz) that a carrier can have. 0 means the CC is not present
+list_of_cc_bws = [0,5,10,15,20,25,30,35,40,45,50,60,70,80,90,100,200,400]
+
+# Create a dictionary of sampling rates
+dict_fs = {0: 0, 5: 7.68, 10: 15.36, 15: 15.36, 20: 30.72, 
+           25: 30.72, 30: 30.72, 35: 61.44, 40: 61.44, 
+           45: 61.44, 50: 61.44, 60: 61.44, 70: 122.88, 
+           80: 122.88, 90: 122.88, 100: 122.88, 200: 122.88, 
+           400: 122.88}
+
+# This function adds a worksheet for each TRX and num CC
+# combination
+def add_ws(wb, num_ccs, num_trx):
+    sheet_name = str(num_trx) + 'T' + str(num_trx) + 'R_' + 'NCC_' + str(num_ccs)
+    worksheet = wb.add_worksheet(sheet_name)
+    return worksheet
+
+# Add a row to the sheet
+def add_xls_row(wb, ws, xls_row_idx, xls_col_idx, cc, ccfs, min_fs, s, l, f_octet, lane_rate):
+    
+    cell_format = wb.add_format()
+    cell_format.set_center_across()
+     
+    for i in cc:
+        ws.write(xls_row_idx, xls_col_idx, i, cell_format)
+        xls_col_idx = xls_col_idx + 1 
+    
+    for i in ccfs:
+        ws.write(xls_row_idx, xls_col_idx, i, cell_format)
+        xls_col_idx = xls_col_idx + 1  
+    
+    ws.write(xls_row_idx, xls_col_idx, min_fs, cell_format)
+    xls_col_idx = xls_col_idx + 1 
+    
+    for i in s:
+        ws.write(xls_row_idx, xls_col_idx, i, cell_format)
+        xls_col_idx = xls_col_idx + 1   
+    
+    ws.write(xls_row_idx, xls_col_idx, l, cell_format)
+    xls_col_idx = xls_col_idx + 1
+    
+    ws.write(xls_row_idx, xls_col_idx, f_octet, cell_format)
+    xls_col_idx = xls_col_idx + 1
+    
+    ws.write(xls_row_idx, xls_col_idx, f_octet*8, cell_format)
+    xls_col_idx = xls_col_idx + 1
+    
+    ws.write(xls_row_idx, xls_col_idx, lane_rate, cell_format)
+    xls_col_idx = xls_col_idx + 1       
+
+# Add sheet header and headings
+def add_xls_sheet_header(wb, ws, xls_row_idx, xls_col_idx, num_trx, num_ccs, M, N_prime):
+    
+
+    cell_format = wb.add_format()
+    cell_format.set_bold(True)
+    cell_format.set_bg_color('yellow')
+    cell_format.set_center_across()
+    
+    ws.write('A1', 'Num TRX')
+    ws.write('B1', num_trx)
+    
+    ws.write('A2', 'Max Num CCs')
+    ws.write('B2', num_ccs)
+    
+    ws.write('A3', 'I/Q')
+    ws.write('B3', 2)
+    
+    ws.write('A4', 'Physical Converters (M)')
+    ws.write('B4', M)
+    
+    ws.write('A5', 'N Prime (bits)')
+    ws.write('B5', N_prime)
+    
+    ws.write('A6', 'Notes')
+    ws.write('A7', '1) A CC bandwidth of 0 means its not present')
+    ws.write('A8', '2) A Oversample Ratio S of 0 means its not present')
+    
+    for i in range(num_ccs):
+        text = 'cc' + str(i) + ' (MHz)'
+        ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+        xls_col_idx = xls_col_idx + 1 
+    
+    for i in range(num_ccs):
+        text = 'cc' + str(i) + '_Fs (MSps)'
+        ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+        xls_col_idx = xls_col_idx + 1  
+    
+    text = 'Min Fs'
+    ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+    xls_col_idx = xls_col_idx + 1 
+    
+    for i in range(num_ccs):
+        text = 'cc' + str(i) + '_S'
+        ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+        xls_col_idx = xls_col_idx + 1   
+    
+    text = 'L'
+    ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+    xls_col_idx = xls_col_idx + 1
+    
+    text = 'F (octets)'
+    ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+    xls_col_idx = xls_col_idx + 1
+    
+    text = 'F (bits)'
+    ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+    xls_col_idx = xls_col_idx + 1
+    
+    text = 'Lane Rate (Gbps)'
+    ws.write(xls_row_idx, xls_col_idx, text, cell_format)
+    xls_col_idx = xls_col_idx + 1      
+
+# This function will return a list of dictionaries. 
+# Each element in the list will be num_ccs number of CC's that
+# will add up to the bw_constraint provided
+def get_ccs(num_ccs=2, bw_constraint=100):
+
+    # Check input parameter valid values
+    if(num_ccs > 16 or num_ccs < 1):
+        raise ValueError("Num CCs should be between 1 and 16")
+        
+    from constraint import Problem
+
+    problem = Problem()
+    for i in range(num_ccs):
+        problem.addVariable("cc"+str(i), list_of_cc_bws)
+    
+    match num_ccs:
+        case 1: 
+            problem.addConstraint(lambda cc0: cc0 == bw_constraint)
+        case 2: 
+            problem.addConstraint(lambda cc0, cc1: cc0 + cc1 == bw_constraint)
+        case 3: 
+            problem.addConstraint(lambda cc0, cc1, cc2: cc0 + cc1 + cc2 == bw_constraint) 
+        case 4: 
+            problem.addConstraint(lambda cc0, cc1, cc2, cc3: cc0 + cc1 + cc2 + cc3 == bw_constraint)
+        case 5: 
+            problem.addConstraint(lambda cc0, cc1, cc2, cc3, cc4: cc0 + cc1 + cc2 + cc3 + cc4 == bw_constraint)
+        case 6: 
+            problem.addConstraint(lambda cc0, cc1, cc2, cc3, cc4, cc5: cc0 + cc1 + cc2 + cc3 + cc4 + cc5 == bw_constraint)
+    solutions = problem.getSolutions()
+    
+    # Now iterate through the list and extract values in the form of a list and store them
+    ccs_sorted = []
+    for dict in solutions:
+        ccs = list(dict.values())
+        ccs.sort()
+        ccs_sorted.append(ccs)
+    
+    ccs_sorted.sort()
+    
+    # Remove all duplicates from the list of lists
+    ccs_unique = []
+    for elem in ccs_sorted:
+        if elem not in ccs_unique:
+            ccs_unique.append(elem)
+        
+    #print(ccs_unique)
+    
+    return ccs_unique
+
+# Memoized partitions. parts(bw, n, start) is every non-decreasing tuple
+# of n CC bandwidths from list_of_cc_bws[start:] that add up to bw. The
+# tuples are built from the partitions of the smaller bandwidth bw - c,
+# so partitions computed for smaller bandwidth targets are reused.
+@lru_cache(maxsize=None)
+def _cc_parts(bw, n, start):
+    if n == 0:
+        return ((),) if bw == 0 else ()
+    parts = []
+    for i in range(start, len(list_of_cc_bws)):
+        c = list_of_cc_bws[i]
+        if c * n > bw:
+            break
+        for rest in _cc_parts(bw - c, n - 1, i):
+            parts.append((c,) + rest)
+    return tuple(parts)
+
+# Same result as get_ccs (sorted list of sorted CC combinations, 0 meaning
+# the CC is not present) without going through the constraint solver.
+def get_cc_partitions(num_ccs=2, bw_constraint=100):
+    """
+    Returns the list of num_ccs CC combinations that add up to
+    bw_constraint. Results are cached, so calling this for increasing
+    bandwidth targets reuses the partitions of the smaller targets.
+    """
+    if(num_ccs > 16 or num_ccs < 1):
+        raise ValueError("Num CCs should be between 1 and 16")
+    return [list(p) for p in _cc_parts(bw_constraint, num_ccs, 0)]
+
+# This function evaluates the lane rate table for every CC combination
+# in one shot. It returns a dictionary of numpy arrays. Per combination
+# arrays have the combination on the first axis, the rest are indexed as
+# [combination, trx, lanes].
+def get_lane_rate_table(list_cc_comb, n_trx, L, N_prime=16, mode='204C'):
+    """
+    Vectorized version of the per combination loop in __main__. Every
+    metric is evaluated across all combinations x n_trx x L at once and
+    checked against the allowed lane rates and integer F as done in
+    ip_rate_calculator. Combinations without any CC present (all 0 MHz)
+    have no sampling rate to run the link at and are left out.
+
+    Parameters:
+    -----------
+        list_cc_comb:   CC combinations, as returned by get_ccs. All
+                        combinations should have the same number of CCs.
+        n_trx:          List of number of TRX
+        L:              List of number of lanes
+        N_prime:        N' (bits)
+        mode:           Link mode, '204C' or '204B' (encoding and allowed
+                        lane rates, see ip_rate_calculator.get_link_mode)
+
+    Returns:
+    -----------
+        ccs:        [C, num_ccs] CC bandwidths of the combinations kept
+        list_fs:    [C, num_ccs] Sampling rate of every CC
+        min_fs:     [C] Minimum sampling rate greater than 0
+        list_S:     [C, num_ccs] Oversampling ratio of every CC
+        Mp:         [C, T] Logical number of converters
+        F:          [C, T, L] Frame size in octets
+        lane_rate:  [C, T, L] Lane rate in Gbps
+        f_int:      [C, T, L] F is an integer
+        lr_ok:      [C, T, L] Lane rate is one of the allowed lane rates
+    """
+    enc, lrs = get_link_mode(mode)
+    # No combination gives [0, 0] CCs, and [0, T, L] for the rest
+    ccs = np.asarray(list_cc_comb, dtype=np.int64).reshape(len(list_cc_comb), -1 if len(list_cc_comb) else 0)
+    trx = np.asarray(n_trx, dtype=np.float64)
+    lanes = np.asarray(L, dtype=np.float64)
+
+    # Look up the sampling rates. list_of_cc_bws is sorted so the index
+    # of every CC bandwidth can be found with a binary search.
+    bws = np.asarray(list_of_cc_bws)
+    fs = np.asarray([dict_fs[x] for x in list_of_cc_bws])
+    idx = np.searchsorted(bws, ccs)
+    assert np.all(bws[np.minimum(idx, len(bws)-1)] == ccs), "Unknown CC bandwidth"
+    list_fs = fs[idx]
+
+    # Leave out the combinations without a CC present
+    keep = (list_fs > 0).any(axis=1)
+    ccs, list_fs = ccs[keep], list_fs[keep]
+
+    # Find the minimum sampling rate greater than 0 
+    min_fs = np.where(list_fs > 0, list_fs, np.inf).min(axis=1, initial=np.inf)
+
+    # Oversampling ratios and logical number of converters
+    list_S = list_fs / min_fs[:, None]
+    Mp = trx[None, :] * list_S.sum(axis=1)[:, None] * 2 # 2 is for IQ
+
+    # Frame size in octets and lane rate
+    F = Mp[:, :, None] * N_prime / 8 / lanes[None, None, :]
+    lane_rate = (F*8) * min_fs[:, None, None] * enc / 1000 # this is in Gbps
+
+    return {
+        'ccs'       : ccs,
+        'list_fs'   : list_fs,
+        'min_fs'    : min_fs,
+        'list_S'    : list_S,
+        'Mp'        : Mp,
+        'F'         : F,
+        'lane_rate' : lane_rate,
+        'f_int'     : F == np.floor(F),
+        'lr_ok'     : np.isin(np.round(lane_rate, 5), lrs),
+    }
+
+# Evaluate one sweep scenario. Runs in a worker process of the sweep
+# and returns flat columns, one entry per (combination, trx, lanes).
+def _sweep_scenario(args):
+    tot_bw, num_ccs, n_trx, L, N_prime, mode = args
+    list_cc_comb = get_cc_partitions(num_ccs, tot_bw)
+    if len(list_cc_comb) == 0:
+        return None
+    tab = get_lane_rate_table(list_cc_comb, n_trx, L, N_prime, mode)
+    C, T, NL = tab['F'].shape
+    comb = np.repeat(np.arange(C), T * NL)
+    return {
+        'tot_bw'    : np.full(C * T * NL, tot_bw),
+        'num_ccs'   : np.full(C * T * NL, num_ccs),
+        'comb'      : comb,
+        'trx'       : np.tile(np.repeat(np.asarray(n_trx), NL), C),
+        'L'         : np.tile(np.asarray(L), C * T),
+        'min_fs'    : tab['min_fs'][comb],
+        'F'         : tab['F'].ravel(),
+        'lane_rate' : tab['lane_rate'].ravel(),
+        'f_int'     : tab['f_int'].ravel(),
+        'lr_ok'     : tab['lr_ok'].ravel(),
+        'ccs'       : tab['ccs'],
+    }
+
+# Sweep mode. Evaluates every (composite bandwidth, num CCs) scenario for
+# all TRX counts and lane counts, spread over a process pool.
+def sweep_carrier_plans(tot_bws, n_trx, n_ccs, L, N_prime=16, workers=None, mode='204C'):
+    """
+    Runs the lane rate table for every composite bandwidth in tot_bws and
+    every number of CCs in n_ccs, for all TRX counts and lane counts, and
+    merges the results into a single IndexedTable (see rate_table).
+
+    Scenarios are handed to the pool in increasing bandwidth order in
+    contiguous chunks, so each worker reuses the partitions it already
+    computed for the smaller bandwidth targets.
+
+    Parameters:
+    -----------
+        tot_bws:    List of composite bandwidths (in MHz)
+        n_trx:      List of number of TRX
+        n_ccs:      List of number of CCs
+        L:          List of number of lanes
+        N_prime:    N' (bits)
+        workers:    Number of worker processes. 1 runs everything in this
+                    process.
+        mode:       Link mode, '204C' or '204B'
+
+    Columns of the returned table:
+    -----------
+        tot_bw, num_ccs, trx, L, min_fs, F, lane_rate, f_int, lr_ok
+        ccs:        CC combination (tuple) of the row
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from .rate_table import IndexedTable
+
+    scenarios = [(bw, ccs, list(n_trx), list(L), N_prime, mode) for ccs in n_ccs for bw in sorted(tot_bws)]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        results = [_sweep_scenario(s) for s in scenarios]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunk = max(1, -(-len(scenarios) // workers))
+            results = list(pool.map(_sweep_scenario, scenarios, chunksize=chunk))
+
+    # Merge the scenario results
+    results = [r for r in results if r is not None]
+    names = ['tot_bw', 'num_ccs', 'trx', 'L', 'min_fs', 'F', 'lane_rate', 'f_int', 'lr_ok']
+    cols = {}
+    for n in names:
+        cols[n] = np.concatenate([r[n] for r in results]) if results else np.empty(0)
+
+    ccs = np.empty(len(cols['tot_bw']), dtype=object)
+    i = 0
+    for r in results:
+        plans = [tuple(p) for p in r['ccs'].tolist()]
+        for c in r['comb']:
+            ccs[i] = plans[c]
+            i += 1
+    cols['ccs'] = ccs
+
+    return IndexedTable(cols,
+                        sorted_on=['lane_rate', 'tot_bw'],
+                        hashed_on=['tot_bw', 'num_ccs', 'trx', 'L', 'f_int', 'lr_ok'])
+
+# Writes the lane rate table for every TRX and num CC combination
+# to an excel sheet.
+def main(book_name='JESD_Calculations.xlsx', n_trx=[2, 4], n_ccs=[2], tot_bw=100,
+         L=[2, 4, 8, 16], N_prime=16, mode='204C'):
+    """
+    Parameters:
+    -----------
+        book_name:  Name of the xlsx workbook
+        n_trx:      Number of TRX (this should be a list for an exhastive table)
+                    One can also think of this as the number of physical converters
+                    albeit not necessarily. 
+        n_ccs:      Number of CCs (this should be a list for an exhaustive table)
+        tot_bw:     Composite bandwidth requirement (in MHz)
+        L:          Number of SERDES lanes (this should be a list of possible Lane configurations)
+        N_prime:    Fixed bit width (bits)
+        mode:       Link mode, '204C' or '204B'
+    """
+    import xlsxwriter as xls
+    
+    # XLSX worksheet
+    wb = xls.Workbook(book_name)
+    
+    
+    # Iterate over every "number of TRX Anennas"
+    for trx in n_trx:
+        # Within this iterate over every CC combination we want to support
+        for ccs in n_ccs:
+            xls_sheet_row = 11
+            xls_sheet_col = 4
+             
+            # Add a sheet to the workbook
+            ws = add_ws(wb, ccs, trx)
+            
+            # Definition of M as per the standard is the number of converters
+            M = trx 
+            
+            # Add Header information to the worksheet
+            add_xls_sheet_header(wb, ws, xls_sheet_row-2, xls_sheet_col, trx, ccs, M, N_prime)
+            
+            # Calculate all CC Combinations that add up to tot_bw
+            list_cc_comb = get_ccs(ccs, tot_bw)
+            # For every CC combination generate a correponding list of 
+            # sampling rates, Oversampling Ratios S, and for every
+            # "Number of lanes" the lane rate. 
+            tab = get_lane_rate_table(list_cc_comb, [trx], L, N_prime, mode)
+            for c, cc_comb in enumerate(tab['ccs'].tolist()): 
+                for li, lanes in enumerate(L):
+                    add_xls_row(wb, ws, xls_sheet_row, xls_sheet_col, cc_comb, tab['list_fs'][c].tolist(), 
+                                tab['min_fs'][c].item(), tab['list_S'][c].tolist(), lanes, 
+                                tab['F'][c, 0, li].item(), tab['lane_rate'][c, 0, li].item())
+                    
+                    xls_sheet_row = xls_sheet_row + 1
+                
+    
+    wb.close()
+
+# Sweep mode. Instead of the spreadsheet, evaluate every composite
+# bandwidth in sweep_bws for all n_trx and n_ccs in one go.
+def main_sweep(sweep_bws=list(range(20, 405, 5)), n_trx=[2, 4], n_ccs=[2], L=[2, 4, 8, 16],
+               N_prime=16, workers=None, mode='204C'):
+    tab = sweep_carrier_plans(sweep_bws, n_trx, n_ccs, L, N_prime, workers, mode)
+    print("Rows: ", len(tab), ", Allowed lane rate and integer F: ", len(tab.select(lr_ok=True, f_int=True)))
+    return tab
+
+
+if __name__ == "__main__":
+    main()
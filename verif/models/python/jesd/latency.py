@@ -0,0 +1,332 @@
+## Description:
+## Link latency of the transport layer for every feasible configuration
+## (rate table rows with an allowed lane rate and integer F). The LAGG
+## block (doc/mld/lagg_pseudocode.sv) runs one link (cmd_mode = 0, up to
+## 16 converters on 8 lanes) or two (cmd_mode = 1). In the dual mode every
+## link has its own converters (cmd_m_0/1), lanes (cmd_l_0/1), N' and OS
+## (cmd_np_0/1, cmd_os_0/1) and is packed on its own, so a dual mode link
+## times the same as a single mode link with its configuration. The
+## table has every configuration once, with the dual column set where it
+## fits a dual mode link (up to 8 converters on 4 lanes).
+## get_dual_timing combines the two links of the dual mode on their shared
+## SYSREF.
+##
+## Every configuration is run through the lane sequencer timing: the
+## strobe masks (with the OS/S sample mapping) give the nibbles into every
+## lane per cycle and pack_lane_words gives the cycle every lane word goes
+## out on, the same packing lseq_v2 does. From those, in 491.52 MHz clocks:
+##
+##   first_word     first input strobe (cycle 0) to the first lane word
+##   lane_skew      spread of first_word over the lanes of the link
+##   buf_nibbles    lane buffer depth, most nibbles held after a cycle
+##   buf_clocks     longest a nibble waits in the lane buffer
+##   mb_clocks      multiblock period, 32 blocks of 66 bits (64 bit words),
+##                  of the slowest lane
+##   mb_int         the multiblock periods are whole clocks
+##   sysref_clocks  smallest SYSREF period that is a whole number of
+##                  multiblocks (of every lane) and strobe pattern periods
+##   sysref_phase   SYSREF phase of the worst case latency
+##   mb_align       first word to the next multiblock boundary of the
+##                  SYSREF grid, at sysref_phase
+##   latency        first word + mb_align, the deterministic (subclass 1)
+##                  latency of the link (its slowest lane), at sysref_phase
+##   latency_min    lowest latency over the SYSREF phases
+##
+## The SYSREF phase is where the SYSREF grid sits relative to the input
+## strobes: with phase p the multiblock boundaries of a lane are at
+## p + ceil(j x mb) for every integer j, in clocks after the first strobe
+## (cycle 0). The phase is in [0, sysref_clocks). Unless one is given,
+## latency is the worst case over all phases and latency_min the best.
+##
+## Clocks are the ones of the model. A word that goes out on the cycle its
+## last nibble comes in has a first_word of 0, register stages of the RTL
+## come on top.
+##
+## Usage:
+##   python3 -m jesd latency dual=true M=8 latency=:200
+##   python3 -m jesd latency --sysref-phase 0 R=6
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import numpy as np
+
+from .rate_table import IndexedTable, get_rate_table
+from .tl_2_dl_mapping import get_strb_window, pack_lane_words
+
+# Blocks per multiblock and nibbles per block (64 bit lane word)
+mb_blocks = 32
+block_nibbles = 16
+
+# Converter and lane limits of the link modes (MMAX and LMAX of LAGG)
+link_limits = {'single': (16, 8), 'dual': (8, 4)}
+
+# Sample rate (MSps) to rate R
+fs_rate = {122.88: 1, 245.76: 2, 368.64: 3, 491.52: 4, 737.28: 6, 983.04: 8}
+
+latency_cols = ['first_word', 'lane_skew', 'buf_nibbles', 'buf_clocks', 'mb_clocks', 'mb_int',
+                'sysref_clocks', 'sysref_phase', 'mb_align', 'latency', 'latency_min']
+
+
+def get_lane_counts(M, L, Np, R, cycles, OS=1, S=1):
+    """
+    Returns the number of nibbles into every lane on every cycle
+    [cycles, L]. The row layout is the one of map_samples (rail 0 then
+    rail 1, 2 x M x OS x S x Np / 4 nibbles). With S = 2 a rail is valid on
+    the second of every two strobes (see s_interleave).
+    Parameters:
+    -----------
+        M:      Number of converters
+        L:      Number of lanes
+        Np:     Precision in bits (N')
+        R:      Rate. Multiple of 122.88 MSPs
+        cycles: Number of 491.52 MHz cycles
+        OS:     Sample repeat
+        S:      Samples per converter per frame
+    """
+    half = M * OS * S * Np // 4
+    assert (2 * half) % L == 0, "Converter bus does not split evenly across the lanes"
+    chunk = 2 * half // L
+
+    # Nibbles of rail 0 and rail 1 in every lane
+    start = chunk * np.arange(L)
+    n0 = np.clip(half - start, 0, chunk)
+    n1 = chunk - n0
+
+    masks = []
+    for m in get_strb_window(R, 0, cycles):
+        idx = np.flatnonzero(m)
+        v = np.zeros(cycles, dtype=bool)
+        v[idx[S - 1::S]] = True
+        masks.append(v)
+    return masks[0][:, None] * n0 + masks[1][:, None] * n1
+
+
+def get_lane_timing(counts):
+    """
+    Runs the lane packing on the nibble counts of every lane. Returns the
+    per lane first word cycle, lane buffer depth (nibbles), longest wait
+    of a nibble (clocks) and the cycles every word went out on.
+    Parameters:
+    -----------
+        counts: Nibbles into every lane per cycle [cycles, L]
+    """
+    first, depth, wait, emits = [], [], [], []
+    C = len(counts)
+    for c in counts.T:
+        total = int(c.sum())
+        stream, words, e, rest = pack_lane_words(np.zeros(total, dtype=np.uint8), c)
+        avail = np.cumsum(c)
+        out = block_nibbles * np.searchsorted(e, np.arange(C), side='right')
+        # Cycle the first nibble of every word went in
+        k = np.arange(len(e))
+        arrive = np.searchsorted(avail, block_nibbles * k, side='right')
+        first.append(int(e[0]) if len(e) else None)
+        depth.append(int((avail - out).max()) if C else 0)
+        wait.append(int((e - arrive).max()) if len(e) else None)
+        emits.append(e)
+    return (first, depth, wait, emits)
+
+
+def get_link_timing(M, L, Np, R, OS=1, S=1, periods=4):
+    """
+    Runs the lane sequencer timing of one configuration. Returns a
+    dictionary with the per lane first word cycle ('first'), buffer depth
+    ('depth'), longest wait ('wait') and multiblock period ('mbs', as a
+    Fraction of clocks), and the SYSREF period ('sysref'). The sequencer is
+    run for `periods` SYSREF periods so that the buffer has reached its
+    steady state.
+    Parameters:
+    -----------
+        M:          Number of converters
+        L:          Number of lanes
+        Np:         Precision in bits (N')
+        R:          Rate. Multiple of 122.88 MSPs
+        OS:         Sample repeat
+        S:          Samples per converter per frame
+        periods:    SYSREF periods to run
+    """
+    # Strobe pattern period and the nibbles of every lane in it. For
+    # R = 6 the rails have different strobes, so lanes on rail 0 run
+    # faster than lanes on rail 1 and have a shorter multiblock.
+    P = 8 * S
+    nibs = get_lane_counts(M, L, Np, R, P, OS, S).sum(axis=0).tolist()
+    assert min(nibs) > 0, "No nibbles into a lane"
+    mbs = [Fraction(mb_blocks * block_nibbles * P, n) for n in nibs]
+    # Multiples of a multiblock that are whole clocks are the multiples
+    # of its numerator
+    sysref = math.lcm(P, *(mb.numerator for mb in mbs))
+
+    cycles = periods * sysref + P
+    first, depth, wait, emits = get_lane_timing(get_lane_counts(M, L, Np, R, cycles, OS, S))
+    assert None not in first, "No lane word in " + str(cycles) + " cycles"
+    return {'first': first, 'depth': depth, 'wait': wait, 'mbs': mbs, 'sysref': sysref}
+
+
+def get_phase_align(timing, phases):
+    """
+    Returns the clocks from the first word of every lane to its next
+    multiblock boundary [len(phases), L] for every SYSREF phase in phases.
+    Phases are taken modulo the SYSREF period of the link.
+    Parameters:
+    -----------
+        timing: Link timing (see get_link_timing)
+        phases: SYSREF phases in clocks after the first strobe
+    """
+    sysref = timing['sysref']
+    phases = np.asarray(phases) % sysref
+    align = []
+    for f, mb in zip(timing['first'], timing['mbs']):
+        # Multiblock boundaries of phase 0 over one SYSREF period, the
+        # last one is the first of the next period
+        b = np.array([math.ceil(j * mb) for j in range(int(sysref / mb) + 1)])
+        x = (f - phases) % sysref
+        align.append(b[np.searchsorted(b, x)] - x)
+    return np.stack(align, axis=1)
+
+
+def get_config_latency(M, L, Np, R, OS=1, S=1, periods=4, sysref_phase=None):
+    """
+    Returns the latency metrics (see the columns at the top) of one
+    configuration as a dictionary.
+    Parameters:
+    -----------
+        M:              Number of converters
+        L:              Number of lanes
+        Np:             Precision in bits (N')
+        R:              Rate. Multiple of 122.88 MSPs
+        OS:             Sample repeat
+        S:              Samples per converter per frame
+        periods:        SYSREF periods to run
+        sysref_phase:   SYSREF phase in clocks after the first strobe. None
+                        gives the worst case over all phases.
+    """
+    t = get_link_timing(M, L, Np, R, OS, S, periods)
+    first, mbs, sysref = t['first'], t['mbs'], t['sysref']
+
+    phases = np.arange(sysref) if sysref_phase is None else np.array([sysref_phase % sysref])
+    align = get_phase_align(t, phases)
+    latency = np.asarray(first) + align
+    worst = latency.max(axis=1)
+    p = int(np.argmax(worst))
+    l = int(np.argmax(latency[p]))
+    return {
+        'first_word'    : max(first),
+        'lane_skew'     : max(first) - min(first),
+        'buf_nibbles'   : max(t['depth']),
+        'buf_clocks'    : max(t['wait']),
+        'mb_clocks'     : float(max(mbs)),
+        'mb_int'        : all(mb.denominator == 1 for mb in mbs),
+        'sysref_clocks' : sysref,
+        'sysref_phase'  : int(phases[p]),
+        'mb_align'      : int(align[p, l]),
+        'latency'       : int(worst[p]),
+        'latency_min'   : int(worst.min()),
+    }
+
+
+def get_latency_configs():
+    """
+    Returns every (N', L, M, Fs, OS, S, lane rate, F) of the rate table
+    with an allowed lane rate and integer F whose converter bus splits
+    evenly across the lanes.
+    """
+    table = get_rate_table(feasible_only=True)
+    cfgs = []
+    for r in table.query():
+        npr, l, m, os_, s = r['N_prime'], r['L'], r['M'], r['OS'], r['S']
+        if r['Fs'] not in fs_rate or (2 * m * os_ * s * npr // 4) % l != 0:
+            continue
+        if m <= link_limits['single'][0] and l <= link_limits['single'][1]:
+            cfgs.append((npr, l, m, r['Fs'], os_, s, r['lane_rate'], r['F']))
+    return cfgs
+
+
+def _latency_row(args):
+    cfg, sysref_phase = args
+    npr, l, m, fs, os_, s, lane_rate, F = cfg
+    max_m, max_l = link_limits['dual']
+    row = {'N_prime': npr, 'L': l, 'M': m, 'Fs': fs, 'R': fs_rate[fs], 'OS': os_, 'S': s,
+           'lane_rate': lane_rate, 'F': F, 'dual': m <= max_m and l <= max_l}
+    row.update(get_config_latency(m, l, npr, fs_rate[fs], os_, s, sysref_phase=sysref_phase))
+    return row
+
+
+def sweep_latency(configs=None, workers=None, sysref_phase=None):
+    """
+    Runs get_config_latency for every configuration in a process pool and
+    returns the results as an IndexedTable.
+    Parameters:
+    -----------
+        configs:        List of (N', L, M, Fs, OS, S, lane rate, F), see
+                        get_latency_configs. Defaults to all of them.
+        workers:        Number of worker processes. 1 runs everything in
+                        this process.
+        sysref_phase:   SYSREF phase, None for the worst case over all
+                        phases (see get_config_latency)
+    """
+    if configs is None:
+        configs = get_latency_configs()
+    jobs = [(c, sysref_phase) for c in configs]
+    if workers == 1:
+        rows = [_latency_row(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            rows = list(pool.map(_latency_row, jobs, chunksize=max(1, len(jobs) // 64)))
+
+    names = ['N_prime', 'L', 'M', 'Fs', 'R', 'OS', 'S', 'lane_rate', 'F', 'dual'] + latency_cols
+    cols = {n: [r[n] for r in rows] for n in names}
+    return IndexedTable(cols,
+                        sorted_on=['latency', 'first_word', 'lane_rate', 'buf_nibbles'],
+                        hashed_on=['dual', 'N_prime', 'L', 'M', 'R', 'OS', 'S', 'mb_int'])
+
+
+def get_dual_timing(link0, link1, periods=4, sysref_phase=None):
+    """
+    Timing of the two links of the dual mode. They share the clock and
+    SYSREF, so a SYSREF phase is the same for both. Returns the skew
+    between their first words, the SYSREF period that suits both links,
+    and the worst case latency of the pair and the latency skew between
+    the links over the SYSREF phases (or at sysref_phase).
+    Parameters:
+    -----------
+        link0:          (M, L, Np, R, OS, S) of link 0 (cmd_m_0, cmd_l_0,
+                        cmd_np_0, R, cmd_os_0, S)
+        link1:          (M, L, Np, R, OS, S) of link 1
+        periods:        SYSREF periods to run
+        sysref_phase:   SYSREF phase, None for the worst case over all
+                        phases
+    """
+    max_m, max_l = link_limits['dual']
+    timing = []
+    for M, L, Np, R, OS, S in (link0, link1):
+        assert M <= max_m and L <= max_l, "A dual mode link has up to 8 converters on 4 lanes"
+        timing.append(get_link_timing(M, L, Np, R, OS, S, periods))
+    t0, t1 = timing
+
+    sysref = math.lcm(t0['sysref'], t1['sysref'])
+    phases = np.arange(sysref) if sysref_phase is None else np.array([sysref_phase % sysref])
+    lat0 = (np.asarray(t0['first']) + get_phase_align(t0, phases)).max(axis=1)
+    lat1 = (np.asarray(t1['first']) + get_phase_align(t1, phases)).max(axis=1)
+    worst = np.maximum(lat0, lat1)
+    return {
+        'first_word_skew' : abs(max(t0['first']) - max(t1['first'])),
+        'sysref_clocks'   : sysref,
+        'sysref_phase'    : int(phases[np.argmax(worst)]),
+        'latency'         : int(worst.max()),
+        'latency_min'     : int(worst.min()),
+        'latency_skew'    : int(np.abs(lat0 - lat1).max()),
+    }
+
+
+def main(conds=None, workers=None, sysref_phase=None):
+    table = sweep_latency(workers=workers, sysref_phase=sysref_phase)
+    print("Rows: ", len(table))
+    for r in table.query(**(conds or {})):
+        print(r)
+    return table
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+## Description:
+## Search based link configuration optimizer. jesd_calculator writes out
+## every CC combination x L into a spreadsheet. This script answers the
+## question directly: given a composite bandwidth, which (CC plan, TRX, N',
+## L, OS) configuration fits in the allowed JESD204C lane rates with the
+## fewest lanes (or the lowest lane rate)?
+##
+## The search is a depth first branch-and-bound over the CC plan. CC
+## bandwidths are picked in non-decreasing order so every plan is visited
+## once. The sums of sampling rates the remaining bandwidth can add up to
+## are kept as a bit mask (reach_fs_units). A partial plan is pruned when
+## none of the totals it can reach is a target total of the link: one that
+## gives an allowed lane rate and, once the smallest CC (plan[0]) is
+## picked, an integer F. The smallest target total left gives a lower
+## bound on the lane rate, which is pruned against the current k-th best
+## configuration.
+##
+## Lane rate and F follow jesd_calculator (Mp = TRX x sum(S) x 2) with the
+## sample repeat OS from ip_rate_calculator:
+##   lane rate = 2 x TRX x N' x OS x sum(Fs) x 66/64 / L
+## (10/8 and the JESD204B lane rates with mode='204B')
+##   F         = 2 x TRX x sum(S) x N' / 8 / L  (octets, has to be integer)
+## All sampling rates are multiples of 7.68 MSps, so the search is done in
+## integer units of 7.68 MSps.
+
+import bisect
+import math
+from functools import lru_cache
+
+from .ip_rate_calculator import enc_rate, get_link_mode, lr
+from .jesd_calculator import list_of_cc_bws, dict_fs
+
+# Sampling rates in units of 7.68 MSps
+fs_unit = 7.68
+fs_units = {bw: int(round(dict_fs[bw] / fs_unit)) for bw in list_of_cc_bws}
+
+# Present CC bandwidths (0 means not present, so it is never picked)
+cc_bws = [bw for bw in list_of_cc_bws if bw > 0]
+
+
+@lru_cache(maxsize=None)
+def min_fs_units(bw, n, start):
+    """
+    Smallest sum of sampling rates (in fs units) of at most n CCs picked
+    from cc_bws[start:] that add up to bw. Returns None if bw cannot be
+    made up this way.
+    """
+    if bw == 0:
+        return 0
+    if n == 0:
+        return None
+    best = None
+    for i in range(start, len(cc_bws)):
+        c = cc_bws[i]
+        if c > bw:
+            break
+        rest = min_fs_units(bw - c, n - 1, i)
+        if rest is not None and (best is None or fs_units[c] + rest < best):
+            best = fs_units[c] + rest
+    return best
+
+
+@lru_cache(maxsize=None)
+def reach_fs_units(bw, n, start):
+    """
+    Sums of sampling rates (in fs units) of at most n CCs picked from
+    cc_bws[start:] that add up to bw, as a bit mask (bit t is set if the
+    sum t can be made). 0 if bw cannot be made up this way.
+    """
+    if bw == 0:
+        return 1
+    if n == 0:
+        return 0
+    mask = 0
+    for i in range(start, len(cc_bws)):
+        c = cc_bws[i]
+        if c > bw:
+            break
+        mask |= reach_fs_units(bw - c, n - 1, i) << fs_units[c]
+    return mask
+
+
+@lru_cache(maxsize=None)
+def get_multiples_mask(m, top):
+    """
+    Bit mask of the multiples of m from 0 to top.
+    """
+    return sum(1 << t for t in range(0, top + 1, m))
+
+
+def get_lane_rate(trx, npr, os, l, units, enc=enc_rate):
+    return round(2 * trx * npr * os * units * fs_unit * enc / (l * 1000), 5)
+
+
+def get_serdes_rate(lane_rate, exact, lrs=lr):
+    """
+    Smallest allowed lane rate (of lrs) that can carry lane_rate. With
+    exact set the lane rate has to be one of the allowed lane rates (as in
+    ip_rate_calculator). Returns None if there is none.
+    """
+    if exact:
+        return lane_rate if lane_rate in lrs else None
+    i = bisect.bisect_left(sorted(lrs), lane_rate)
+    return sorted(lrs)[i] if i < len(lrs) else None
+
+
+def get_key(objective, l, lane_rate, trx):
+    match objective:
+        case 'lanes':
+            return (l, lane_rate, trx)
+        case 'lane_rate':
+            return (lane_rate, l, trx)
+    raise ValueError("objective should be 'lanes' or 'lane_rate'")
+
+
+def optimize(tot_bw=100, num_ccs=2, n_trx=(2, 4), N_prime=(12, 16, 24, 32, 48),
+             L=(1, 2, 4, 8, 16), OS=(1, 2), objective='lanes', k=10, exact=False, mode='204C'):
+    """
+    Returns the k best configurations that carry tot_bw, ranked by the
+    objective. Each configuration is a dictionary with the CC plan, sampling
+    rates, S, TRX, N', L, OS, F, lane rate and the allowed lane rate it
+    runs at.
+
+    Parameters:
+    -----------
+        tot_bw:     Composite bandwidth requirement (in MHz)
+        num_ccs:    Maximum number of CCs in a plan
+        n_trx:      TRX counts to consider
+        N_prime:    N' values to consider
+        L:          Lane counts to consider
+        OS:         Sample repeat values to consider
+        objective:  'lanes'     : fewest lanes, then lowest lane rate
+                    'lane_rate' : lowest lane rate, then fewest lanes
+        k:          Number of configurations to return
+        exact:      Lane rate has to be exactly one of the allowed lane rates.
+                    Otherwise the lane runs at the next allowed lane rate.
+        mode:       Link mode, '204C' or '204B' (encoding and allowed lane
+                    rates)
+    """
+    enc, lrs = get_link_mode(mode)
+    max_lr = max(lrs)
+    best_units = min_fs_units(tot_bw, num_ccs, 0)
+    if best_units is None:
+        return []
+
+    reach = reach_fs_units(tot_bw, num_ccs, 0)
+    top_units = reach.bit_length() - 1
+
+    # Sort the link parameters on their bound so that good configurations
+    # are found first and the remaining ones get pruned. Every link gets
+    # the mask of the totals (fs units) that give an allowed lane rate.
+    links = []
+    for trx in n_trx:
+        for npr in N_prime:
+            for os in OS:
+                for l in L:
+                    lr_lb = get_lane_rate(trx, npr, os, l, best_units, enc)
+                    if lr_lb > max_lr:
+                        continue
+                    rates = 0
+                    for u in range(best_units, top_units + 1):
+                        if get_serdes_rate(get_lane_rate(trx, npr, os, l, u, enc), exact, lrs) is not None:
+                            rates |= 1 << u
+                    if reach & rates:
+                        links.append((get_key(objective, l, lr_lb, trx), trx, npr, os, l, rates))
+    links.sort()
+
+    top = [] # sorted list of (key, count, config)
+    count = 0
+
+    def full():
+        return len(top) >= k
+
+    def leaf(plan, units, trx, npr, os, l):
+        nonlocal count
+        min_u = fs_units[plan[0]]
+        # F has to be an integer number of octets
+        if (2 * trx * units * npr) % (8 * l * min_u) != 0:
+            return
+        lane_rate = get_lane_rate(trx, npr, os, l, units, enc)
+        serdes_rate = get_serdes_rate(lane_rate, exact, lrs)
+        if serdes_rate is None:
+            return
+        key = get_key(objective, l, lane_rate, trx)
+        if full() and key >= top[-1][0]:
+            return
+        list_fs = [dict_fs[c] for c in plan]
+        cfg = {
+            'ccs'         : list(plan),
+            'list_fs'     : list_fs,
+            'min_fs'      : dict_fs[plan[0]],
+            'S'           : [fs_units[c] // min_u for c in plan],
+            'trx'         : trx,
+            'N_prime'     : npr,
+            'L'           : l,
+            'OS'          : os,
+            'F'           : 2 * trx * units * npr // (8 * l * min_u),
+            'lane_rate'   : lane_rate,
+            'serdes_rate' : serdes_rate,
+        }
+        bisect.insort(top, (key, count, cfg))
+        count += 1
+        del top[k:]
+
+    def search(plan, rem, units, start, trx, npr, os, l, target):
+        if rem == 0:
+            leaf(plan, units, trx, npr, os, l)
+            return
+        n_left = num_ccs - len(plan)
+        for i in range(start, len(cc_bws)):
+            c = cc_bws[i]
+            if c > rem:
+                break
+            t = target
+            if not plan:
+                # F is an integer when the total is a multiple of m
+                d = 8 * l * fs_units[c]
+                m = d // math.gcd(d, 2 * trx * npr)
+                t &= get_multiples_mask(m, top_units)
+            # Target totals that a plan below this node can reach
+            hit = (reach_fs_units(rem - c, n_left - 1, i) << (units + fs_units[c])) & t
+            if hit == 0:
+                continue
+            # Bound on the lane rate of every plan below this node
+            lr_lb = get_lane_rate(trx, npr, os, l, (hit & -hit).bit_length() - 1, enc)
+            if full() and get_key(objective, l, lr_lb, trx) >= top[-1][0]:
+                continue
+            plan.append(c)
+            search(plan, rem - c, units + fs_units[c], i, trx, npr, os, l, t)
+            plan.pop()
+
+    for bound, trx, npr, os, l, rates in links:
+        if full() and bound >= top[-1][0]:
+            # links are sorted on their bound, nothing after this can do better
+            break
+        search([], tot_bw, 0, 0, trx, npr, os, l, rates)
+
+    return [cfg for key, c, cfg in top]
+
+
+def main(tot_bw=400, num_ccs=16, n_trx=[16], objective='lanes', k=10):
+    for cfg in optimize(tot_bw, num_ccs, n_trx, objective=objective, k=k):
+        print(cfg)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+## Description:
+## Small asyncio HTTP/JSON service that wraps the rate calculator, the CC
+## enumerator (get_ccs) and the lane mapper so that dashboards and scripts
+## can share one warm process instead of editing the lists in __main__ of
+## each script and rerunning it. Only meant to run on localhost.
+##
+## Endpoints (GET with a query string or POST with a JSON body):
+##   /rates     Rate table query. Same conditions as IndexedTable.select.
+##              GET : /rates?M=8&L=:4&lane_rate=:16.22016&f_int=1
+##                    (a:b is an inclusive range, a,b,c is a list)
+##              POST: {"M": 8, "L": {"max": 4}, "lane_rate": {"max": 16.22016}}
+##   /ccs       CC combinations. Parameters num_ccs, bw
+##   /lane_map  S2W + LSEQ lane mapping. Parameters nSamp, R, M, L, Np
+##   /stats     Cache statistics: hits, misses and coalesced (requests
+##              that waited on the computation of an identical request)
+##
+## Results of /ccs and /lane_map are kept in an in-process LRU and computed
+## in a process pool. Identical requests that arrive while a result is
+## being computed wait on the same computation.
+##
+## Usage:
+##   python3 -m jesd serve --port 8204 --workers 4
+
+import argparse
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl
+
+from .jesd_calculator import get_ccs
+from .rate_table import get_rate_table
+from .tl_2_dl_mapping import get_lane_map
+
+# Acceptable ranges for lane map parameters. Same as s2w.
+acceptable_R = [1, 2, 3, 4, 6, 8]
+acceptable_M = [2, 4, 8, 16]
+acceptable_Np = [12, 16, 24, 32, 48]
+
+# Largest number of samples a single lane map request can ask for
+max_lane_map_samp = 4096
+
+# Largest request body (bytes)
+max_body = 1 << 20
+
+
+class LruCache:
+    """
+    Least recently used cache of computed results. Keys are tuples of the
+    endpoint and its canonical parameters.
+
+    Parameters:
+    -----------
+        maxsize:    Number of results to keep.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.data:
+            self.data.move_to_end(key)
+            self.hits += 1
+            return self.data[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+
+class BadRequest(Exception):
+    pass
+
+
+class NotFound(Exception):
+    pass
+
+
+def parse_value(s):
+    """
+    Converts a query string value to int/float/bool where possible.
+    """
+    if s in ('true', 'True'):
+        return True
+    if s in ('false', 'False'):
+        return False
+    for t in (int, float):
+        try:
+            return t(s)
+        except ValueError:
+            pass
+    return s
+
+
+def is_number(v):
+    return isinstance(v, (int, float))
+
+
+def is_rate_cond(v):
+    """
+    Returns True if v is a number, a non-empty list of numbers or a
+    (min, max) range of numbers where either end may be None.
+    """
+    match v:
+        case tuple():
+            return len(v) == 2 and all(x is None or is_number(x) for x in v)
+        case list():
+            return len(v) > 0 and all(is_number(x) for x in v)
+    return is_number(v)
+
+
+def get_rate_conds(params, from_query):
+    """
+    Converts request parameters to IndexedTable.select conditions. Raises
+    BadRequest if a value is not a number, a list of numbers or a range.
+    """
+    conds = {}
+    for k, v in params.items():
+        if from_query:
+            if ':' in v:
+                lo, hi = v.split(':', 1)
+                v = (parse_value(lo) if lo else None, parse_value(hi) if hi else None)
+            elif ',' in v:
+                v = [parse_value(x) for x in v.split(',')]
+            else:
+                v = parse_value(v)
+        elif isinstance(v, dict) and set(v) <= {'min', 'max'}:
+            v = (v.get('min'), v.get('max'))
+        if not is_rate_cond(v):
+            raise BadRequest("Condition on " + str(k) + " should be a number, a list of numbers or a range")
+        if k in ('f_int', 'lr_ok') and not isinstance(v, (tuple, list)):
+            v = bool(v)
+        conds[k] = v
+    return conds
+
+
+def get_content_length(v):
+    """
+    Returns the Content-Length header value as an int, or None if it is not
+    an integer in the range 0 to max_body.
+    """
+    if not v.isdigit():
+        return None
+    n = int(v)
+    return n if n <= max_body else None
+
+
+def get_int_params(params, names):
+    try:
+        return [int(params[n]) for n in names]
+    except KeyError as e:
+        raise BadRequest("Missing parameter " + str(e))
+    except (TypeError, ValueError):
+        raise BadRequest("Parameters should be integers: " + ", ".join(names))
+
+
+def run_ccs(num_ccs, bw):
+    return get_ccs(num_ccs, bw)
+
+
+def run_lane_map(nSamp, R, M, L, Np):
+    s2w_out, lane_out = get_lane_map(nSamp, R, M, L, Np)
+    return {'converter_if': s2w_out, 'lanes': lane_out}
+
+
+class RateService:
+    """
+    Request handling for the service. The rate table is built once when
+    the service is created.
+
+    Parameters:
+    -----------
+        workers:    Number of processes in the pool for CC and lane map runs
+        cache_size: Number of results kept in the LRU
+    """
+
+    def __init__(self, workers=None, cache_size=256):
+        self.table = get_rate_table(feasible_only=False)
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.cache = LruCache(cache_size)
+        self.inflight = {}
+        self.coalesced = 0
+
+    def close(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+    async def cached(self, key, fn, *args):
+        # Someone else is already computing this result. Checked ahead of
+        # the cache so that waiting on it does not count as a miss.
+        if key in self.inflight:
+            self.coalesced += 1
+            return await asyncio.shield(self.inflight[key])
+
+        res = self.cache.get(key)
+        if res is not None:
+            return res
+
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self.pool, fn, *args)
+        self.inflight[key] = fut
+        try:
+            res = await fut
+        finally:
+            del self.inflight[key]
+        self.cache.put(key, res)
+        return res
+
+    async def dispatch(self, path, params, from_query):
+        match path:
+            case '/rates':
+                conds = get_rate_conds(params, from_query)
+                for c in conds:
+                    if c not in self.table.cols:
+                        raise BadRequest("Unknown column " + c)
+                return self.table.query(**conds)
+
+            case '/ccs':
+                num_ccs, bw = get_int_params(params, ['num_ccs', 'bw'])
+                # get_ccs only has constraints up to 6 CCs
+                if num_ccs < 1 or num_ccs > 6:
+                    raise BadRequest("num_ccs should be in the range 1 to 6")
+                return await self.cached(('ccs', num_ccs, bw), run_ccs, num_ccs, bw)
+
+            case '/lane_map':
+                nSamp, R, M, L, Np = get_int_params(params, ['nSamp', 'R', 'M', 'L', 'Np'])
+                if R not in acceptable_R:
+                    raise BadRequest("R should be in: " + str(acceptable_R))
+                if M not in acceptable_M:
+                    raise BadRequest("M should be in: " + str(acceptable_M))
+                if Np not in acceptable_Np:
+                    raise BadRequest("Np should be in: " + str(acceptable_Np))
+                if L < 1 or (2 * M * Np // 4) % L != 0:
+                    raise BadRequest("The converter bus should split evenly into L lanes")
+                if nSamp < 1 or nSamp > max_lane_map_samp:
+                    raise BadRequest("nSamp should be in the range 1 to " + str(max_lane_map_samp))
+                return await self.cached(('lane_map', nSamp, R, M, L, Np), run_lane_map, nSamp, R, M, L, Np)
+
+            case '/stats':
+                return {'hits': self.cache.hits, 'misses': self.cache.misses, 'coalesced': self.coalesced,
+                        'entries': len(self.cache.data), 'inflight': len(self.inflight)}
+
+        raise NotFound(path)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode('latin-1').split()
+                except ValueError:
+                    await respond(writer, 400, {'error': 'Malformed request line'}, False)
+                    break
+
+                headers = {}
+                while True:
+                    h = await reader.readline()
+                    if h in (b'\r\n', b'\n', b''):
+                        break
+                    k, _, v = h.decode('latin-1').partition(':')
+                    headers[k.strip().lower()] = v.strip()
+
+                body = b''
+                if 'content-length' in headers:
+                    # Without a valid length the end of the body is unknown,
+                    # so the connection cannot be kept either
+                    n = get_content_length(headers['content-length'])
+                    if n is None:
+                        await respond(writer, 400, {'error': 'Content-Length should be an integer in the range 0 to '
+                                                             + str(max_body)}, False)
+                        break
+                    body = await reader.readexactly(n)
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+                url = urlsplit(target)
+                status = 200
+                try:
+                    if method == 'GET':
+                        res = await self.dispatch(url.path, dict(parse_qsl(url.query)), True)
+                    elif method == 'POST':
+                        params = json.loads(body or b'{}')
+                        if not isinstance(params, dict):
+                            raise BadRequest("Body should be a JSON object")
+                        res = await self.dispatch(url.path, params, False)
+                    else:
+                        status, res = 405, {'error': 'Only GET and POST are supported'}
+                except BadRequest as e:
+                    status, res = 400, {'error': str(e)}
+                except json.JSONDecodeError as e:
+                    status, res = 400, {'error': 'Invalid JSON: ' + str(e)}
+                except NotFound:
+                    status, res = 404, {'error': 'Unknown endpoint ' + url.path}
+                except Exception as e:
+                    status, res = 500, {'error': repr(e)}
+
+                await respond(writer, status, res, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+async def respond(writer, status, res, keep_alive):
+    body = json.dumps(res).encode()
+    head = ('HTTP/1.1 ' + str(status) + ' ' + reasons[status] + '\r\n'
+            'Content-Type: application/json\r\n'
+            'Content-Length: ' + str(len(body)) + '\r\n'
+            'Connection: ' + ('keep-alive' if keep_alive else 'close') + '\r\n\r\n')
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def serve(host='127.0.0.1', port=8204, workers=None, cache_size=256):
+    svc = RateService(workers, cache_size)
+    server = await asyncio.start_server(svc.handle, host, port)
+    print("Serving on http://" + host + ":" + str(port))
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        svc.close()
+
+
+def add_args(parser):
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8204)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-size', type=int, default=256)
+
+
+def main(args):
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='JESD rate and lane map service')
+    add_args(parser)
+    main(parser.parse_args())
@@ -0,0 +1,186 @@
+## Description:
+## In-memory indexed table of JESD rate/configuration rows. Instead of
+## filtering JESD_Rates.xlsx by hand, the feasible set from the rate sweep
+## in ip_rate_calculator is held as numpy columns with sorted indexes (for
+## range queries) and hash indexes (for equality queries) so that a query
+## like "lane rate <= 16.22016 Gbps, L <= 4, M = 8, integer F" is answered
+## in microseconds.
+##
+## Example:
+##   table = get_rate_table()
+##   rows  = table.query(lane_rate=(None, 16.22016), L=(None, 4), M=8, f_int=True)
+
+import numpy as np
+
+from .ip_rate_calculator import get_link_mode, get_rates
+
+# Default sweep. Same as the lists used to create JESD_Rates.xlsx
+rate_sweep = {
+    'N_prime' : [12, 16, 24, 32, 48],
+    'L'       : [1, 2, 4, 8],
+    'M'       : [2, 4, 8, 16],
+    'Fs'      : [122.88, 245.76, 491.52, 737.28, 983.04],
+    'OS'      : [1, 2],
+    'S'       : [1, 2],
+}
+
+# Column names of the rate table in the order get_rates returns them.
+rate_cols = ['N_prime', 'L', 'M', 'Fs', 'OS', 'S', 'lane_rate', 'F']
+
+
+class IndexedTable:
+    """
+    Column store with sorted and hash indexes. Every column is a numpy
+    array of the same length. Indexes are built once when the table is
+    created, queries only do binary searches and dictionary lookups and
+    then intersect the candidate rows.
+
+    Parameters:
+    -----------
+        cols:       Dictionary of column name to list/array of values.
+        sorted_on:  Columns that get a sorted index (range queries).
+        hashed_on:  Columns that get a hash index (equality queries).
+    """
+
+    def __init__(self, cols, sorted_on=(), hashed_on=()):
+        self.cols = {k: np.asarray(v) for k, v in cols.items()}
+        lengths = set(len(v) for v in self.cols.values())
+        assert len(lengths) <= 1, "All columns should have the same length"
+        self.num_rows = lengths.pop() if lengths else 0
+
+        # Sorted index: (row order, sorted values) so that a range maps
+        # to a contiguous slice of the row order.
+        self.sorted_idx = {}
+        for c in sorted_on:
+            order = np.argsort(self.cols[c], kind='stable')
+            self.sorted_idx[c] = (order, self.cols[c][order])
+
+        # Hash index: value -> rows with that value.
+        self.hash_idx = {}
+        for c in hashed_on:
+            idx = {}
+            for r, v in enumerate(self.cols[c].tolist()):
+                idx.setdefault(v, []).append(r)
+            self.hash_idx[c] = {v: np.array(r, dtype=np.intp) for v, r in idx.items()}
+
+    def __len__(self):
+        return self.num_rows
+
+    def _rows_eq(self, c, v):
+        if c in self.hash_idx:
+            return self.hash_idx[c].get(v, np.empty(0, dtype=np.intp))
+        if c in self.sorted_idx:
+            return self._rows_range(c, v, v)
+        return np.flatnonzero(self.cols[c] == v)
+
+    def _rows_range(self, c, lo, hi):
+        if c in self.sorted_idx:
+            order, vals = self.sorted_idx[c]
+            a = 0 if lo is None else np.searchsorted(vals, lo, side='left')
+            b = len(vals) if hi is None else np.searchsorted(vals, hi, side='right')
+            return order[a:b]
+        mask = np.ones(self.num_rows, dtype=bool)
+        if lo is not None:
+            mask &= self.cols[c] >= lo
+        if hi is not None:
+            mask &= self.cols[c] <= hi
+        return np.flatnonzero(mask)
+
+    def select(self, **conds):
+        """
+        Returns the (sorted) row numbers that satisfy every condition.
+        A condition is either a value (equality), a (lo, hi) tuple (inclusive
+        range, None for an open end) or a list/set of accepted values.
+        """
+        cand = []
+        for c, v in conds.items():
+            if isinstance(v, tuple):
+                cand.append(self._rows_range(c, v[0], v[1]))
+            elif isinstance(v, (list, set, frozenset)):
+                cand.append(np.concatenate([self._rows_eq(c, x) for x in v] or [np.empty(0, dtype=np.intp)]))
+            else:
+                cand.append(self._rows_eq(c, v))
+
+        if not cand:
+            return np.arange(self.num_rows)
+
+        # Intersect starting from the smallest candidate set.
+        cand.sort(key=len)
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[cand[0]] = True
+        for rows in cand[1:]:
+            if not mask.any():
+                break
+            m = np.zeros(self.num_rows, dtype=bool)
+            m[rows] = True
+            mask &= m
+        return np.flatnonzero(mask)
+
+    def query(self, **conds):
+        """
+        Same conditions as select, but returns the matching rows as a list
+        of dictionaries.
+        """
+        rows = self.select(**conds)
+        names = list(self.cols.keys())
+        vals = [self.cols[c][rows].tolist() for c in names]
+        return [dict(zip(names, r)) for r in zip(*vals)]
+
+    def take(self, rows):
+        """
+        Returns a new IndexedTable with only the given rows. Indexes are
+        rebuilt on the same columns.
+        """
+        return IndexedTable({c: v[rows] for c, v in self.cols.items()},
+                            sorted_on=self.sorted_idx.keys(),
+                            hashed_on=self.hash_idx.keys())
+
+
+def get_rate_table(sweep=None, feasible_only=True, mode='204C'):
+    """
+    Builds an IndexedTable from the rate sweep. Sorted indexes are on
+    lane rate, L, M and Fs, hash indexes on L, M, Fs, N', OS, S and on
+    the two feasibility flags.
+
+    Columns:
+    -----------
+        N_prime, L, M, Fs, OS, S, lane_rate, F
+        f_int:      F is an integer
+        lr_ok:      lane rate is one of the accepted lane rates
+
+    Parameters:
+    -----------
+        sweep:          Dictionary with the same keys as rate_sweep. Defaults
+                        to rate_sweep.
+        feasible_only:  Only keep the rows that go into JESD_Rates.xlsx. When
+                        False, every swept combination is kept and the
+                        f_int/lr_ok columns can be used in the query.
+        mode:           Link mode, '204C' or '204B' (lane rate and the
+                        accepted lane rates of lr_ok)
+    """
+    if sweep is None:
+        sweep = rate_sweep
+
+    enc, lrs = get_link_mode(mode)
+    rows = get_rates(sweep['N_prime'], sweep['L'], sweep['M'], sweep['Fs'],
+                     sweep['OS'], sweep['S'], feasible_only=feasible_only, mode=mode)
+
+    cols = {c: [r[i] for r in rows] for i, c in enumerate(rate_cols)}
+    cols['f_int'] = [float(f).is_integer() for f in cols['F']]
+    cols['lr_ok'] = [x in lrs for x in cols['lane_rate']]
+
+    return IndexedTable(cols,
+                        sorted_on=['lane_rate', 'L', 'M', 'Fs'],
+                        hashed_on=['L', 'M', 'Fs', 'N_prime', 'OS', 'S', 'f_int', 'lr_ok'])
+
+
+def main():
+    table = get_rate_table(feasible_only=False)
+    print("Rows: ", len(table))
+
+    for r in table.query(lane_rate=(None, 16.22016), L=(None, 4), M=8, f_int=True, lr_ok=True):
+        print(r)
+
+
+if __name__ == "__main__":
+    main()
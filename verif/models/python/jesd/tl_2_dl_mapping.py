@@ -0,0 +1,895 @@
+## Author: Sai Kilambi
+## Date Created: Sept 1 2023
+## Description:
+#  This python script will use the JESD_Rates xls which provides
+#  all the options for acceptable rates. From this we need to
+#  figure out how data will be mapped into the 64 bit bus of the
+#  lanes. Note this is happening after the raw converter samples
+#  have been mapped into converter words. 
+#
+#  Some notes about notation
+#  Converter is specified by M0 to M15. But since we are thinking
+#  of ZIF, we can combine pairs of converters. This means we these
+#  I/Q converters are in the range m0 to m7. Each raw sample from
+#  each converter is N' bits and hence the size of an IQ sample is
+#  2 x N'. 
+#  IQ samples will be specified by m<iq converter index>_<sample index>
+#  If the 64 bits contains more than one sample, we will specify this in 
+#  square brackets. For instance if N'=16 bits, M=2 then 64 bits lane
+#  sample will be written as:
+#  [m0_1 m0_0]
+#  This is the concatenation of two 32 bit sample. 
+
+# First case of M=2, N'=16 bits and L = 2. 
+# In this case 2 converter outputs (32 bit total)
+# is being mapped to two lanes.  
+
+import multiprocessing
+
+import numpy as np
+
+from . import instrument
+
+# Process pool of the lseq_v2 pool mode, kept across calls as
+# (workers, pool). See get_lane_pool.
+_lane_pool = None
+
+@instrument.timed('lseq')
+def lseq_v2(inSamp, L, M, R, verbose=True, masks=None, state=None, mode='serial', workers=None, executor=None):
+    """
+    This is a more generic version of lseq_v1. The insight here is that if you
+    look at the number of converters and number of phases (due to rate), it will
+    always be more than or equal to the number of lanes. This number will be a 
+    multiple of the number of lanes. So actually the whole sequencing of sample
+    bytes can be done in terms of loops instead of the case state method we 
+    were using in v1. 
+    
+    Parameters:
+    -----------
+        inSamp: This is a list (super) of lists (sub). Every row in the super list
+                can be thought of as a parallel bus word coming through. Every item
+                in the sub-list is a byte belonging to the converters specified by 
+                M. 
+        L:      Number of programmed lanes.
+        M:      Number of programmed converters.
+        R:      Sampling rate.
+                    1: 122.88 MHz
+                    2: 245.76 MHz
+                    3. 368.64 MHz
+                    4: 491.52 MHz
+                    6: 737.28 MHz
+                    8: 983.04 MHz
+        verbose: Pretty print the lane outputs.
+        masks:  Valid masks of rail 0 and rail 1, one entry per row of
+                inSamp (see get_strb_masks). If None the valid nibbles
+                are the ones that are not 'x'.
+        state:  Sequencer state from new_lseq_state. The rows continue
+                from this state and the state is updated in place, so a
+                long capture can be run in parts. The state only holds
+                lists, ints and strings and can be saved as JSON.
+        mode:   serial  all lanes cycle by cycle
+                lanes   input split into one stream per lane, every lane
+                        packed with array operations (pack_lane)
+                pool    as lanes, with the lanes spread over executor.
+                        The workers only get the nibble counts of their
+                        lane and send back the row layout as indices
+                        (see get_lane_index), the nibbles stay here.
+                All modes give the same output.
+        workers: Number of processes for the pool mode.
+        executor: Executor for the pool mode. Defaults to a process pool
+                of workers processes that is kept across calls (see
+                get_lane_pool). In a worker process of another process
+                pool the lanes are packed in that process instead.
+    """
+    
+    # Number of phases based on Rate
+    P = get_num_phases(R)
+    
+    # create an empty list for each lane. Every row in each
+    # lane will be a 64 bit word.
+    lane = [[] for i in range(L)]
+    
+    # pending stores the nibbles that go into the 64 bit words of a
+    # lane, in the order they go in. This is a list of lists. The
+    # super-list is of size L because for every cycle you will be
+    # sequencing in the nibbles from a part of the input parallel bus
+    # that will feed a particular lane. A lane takes one 64 bit word per
+    # cycle, so when a cycle brings in more than 16 nibbles the rest
+    # waits in pending for the next cycles.
+    if state is None:
+        state = new_lseq_state(L)
+    assert state['L'] == L, "Sequencer state is for a different number of lanes"
+    pending = state['pending']
+
+    # Valid nibble masks. Either from the strobes of the two rails (first
+    # half of every row is rail 0, second half rail 1) or from the 'x'
+    # placeholders in the rows.
+    data = np.asarray(inSamp)
+    if masks is None:
+        valid = data != 'x'
+    else:
+        half = data.shape[1] // 2
+        valid = np.repeat(np.stack(masks, axis=1), half, axis=1)
+
+    # Reshape every row such that the number of rows is the number of
+    # lanes. This way we can think of each row feeding a lane. Makes
+    # visualizing and processing easier. To understand this, inSamp rows
+    # is the full bus which is made up of all the converters, the samples,
+    # the bytes and the phases. You want to break them up into L sections
+    # so that each section is now feeding into its respective lane.
+    data = data.reshape(len(inSamp), L, -1)
+    valid = valid.reshape(len(inSamp), L, -1)
+
+    match mode:
+        case 'serial':
+            for x, v in zip(data, valid):
+                for l in reversed(range(L)):
+                    ## Now that the row is split into L subrows, feed the valid
+                    ## nibbles of each sub-row into each lane. A sub-row can
+                    ## have invalid nibbles when it spans both rails. Nibbles go
+                    ## in from the end of the sub-row.
+                    pending[l].extend(x[l][v[l]][::-1].tolist())
+
+                    # Only when 64 bits have been accumulated do we say that this
+                    # is a valid cycle and the word goes out. Otherwise the row
+                    # shows the word being filled, from index 15 down, with 'x'
+                    # for the nibbles still missing.
+                    if len(pending[l]) >= 16:
+                        samp = pending[l][:16]
+                        del pending[l][:16]
+                    else:
+                        samp = pending[l]
+                    lane[l].append(['x']*(16 - len(samp)) + samp[::-1])
+
+        case 'lanes' | 'pool':
+            # The lanes do not depend on each other, so split the input into
+            # one nibble stream per lane up front and pack every lane on its
+            # own (see pack_lane).
+            streams = get_lane_streams(data, valid)
+            # A worker process of another pool packs its lanes itself. A
+            # pool forked from it can hang on the locks of its threads and
+            # keeps it from exiting.
+            if mode == 'pool' and L > 1 and (executor or multiprocessing.parent_process() is None):
+                pool = executor or get_lane_pool(workers)
+                index = list(pool.map(get_lane_index, [c for s, c in streams], [len(p) for p in pending]))
+            else:
+                index = [None] * L
+            for l, (stream, counts) in enumerate(streams):
+                lane[l], pending[l][:] = pack_lane(stream, counts, pending[l], index[l])
+
+        case _:
+            raise ValueError("mode should be one of serial, lanes or pool")
+
+    state['cycle'] += len(inSamp)
+
+    if instrument.enabled:
+        # Every valid nibble of the input is moved into a lane. A lane word
+        # is emitted when all 16 nibbles are filled.
+        instrument.count('nibbles_moved', int(valid.sum()))
+        instrument.count('words_emitted', sum(1 for l in lane for w in l if 'x' not in w))
+
+    if not verbose:
+        return lane
+
+    # Now pretty print the lane outputs
+    print(" ***************** MODULE LSEQ OUTPUT *****************")
+    print('')
+    print("============= Parameters")
+    print("Number of Converters: ", M)
+    print("Number of Phases: ", get_num_phases(R))
+    print("Number of Lanes: ", L)
+    print("Precision (bits): ", 64)
+    print("Sampling Rate: ", get_sample_rate(R), "MSps")
+    print("Clock Rate: 491.52 MHz")
+    for l in range(L):
+        print("============ LANE ", l, " OUTPUT =============")
+        #print(lane[l])
+        print_table(l, R, M, 64, lane[l], 'lseq', "LSEQ OUTPUT")
+    
+    return lane
+
+
+# @@@@@@@@@@@@@@@ END OF LSEQ_V2 Function
+
+
+def get_lane_streams(data, valid):
+    """
+    Splits the rows into one nibble stream per lane. Returns a list with
+    (valid nibbles in the order they go into the lane, number of nibbles
+    on every cycle) for every lane.
+    Parameters:
+    -----------
+        data:   Rows split by lane [cycles, L, nibbles per lane]
+        valid:  Valid nibbles, same shape as data
+    """
+    return [(data[:, l, ::-1][valid[:, l, ::-1]], valid[:, l].sum(axis=1)) for l in range(data.shape[1])]
+
+
+def pack_lane_words(stream, counts, pending=()):
+    """
+    Packs the nibble stream of one lane into 64 bit words. Returns the
+    stream (pending nibbles first), the words that went out [words, 16]
+    in the order the nibbles went in, the cycle every word went out on,
+    and the nibbles left over at the end.
+
+    The lane takes one word per cycle. Word k is complete at the first
+    cycle a_k where 16 (k + 1) nibbles have come in, and goes out at
+    e_k = max(a_k, e_(k-1) + 1) = k + max(a_j - j, j <= k).
+    Parameters:
+    -----------
+        stream:     Valid nibbles of the lane in the order they go in
+        counts:     Number of nibbles coming in on every cycle
+        pending:    Nibbles left over from before the first cycle
+    """
+    if len(pending):
+        stream = np.concatenate([np.array(list(pending)), stream])
+    e = get_word_cycles(counts, len(pending))
+
+    words = stream[:16 * len(e)].reshape(-1, 16)
+    return (stream, words, e, stream[16 * len(e):])
+
+
+def get_word_cycles(counts, n_pending=0):
+    """
+    Cycle every word of a lane goes out on (see pack_lane_words).
+    Parameters:
+    -----------
+        counts:     Number of nibbles coming in on every cycle
+        n_pending:  Number of nibbles left over from before the first cycle
+    """
+    C = len(counts)
+
+    # Nibbles in by the end of every cycle
+    avail = np.cumsum(counts) + n_pending
+
+    # Cycle on which every word goes out
+    K = int(avail[-1]) // 16 if C else 0
+    a = np.searchsorted(avail, 16 * np.arange(1, K + 1))
+    k = np.arange(K)
+    e = k + np.maximum.accumulate(a - k) if K else a
+    return e[e < C]
+
+
+def get_lane_index(counts, n_pending=0):
+    """
+    Row layout of one lane as indices into its stream (pending nibbles
+    first, see pack_lane). Returns the index of every nibble of every row
+    [cycles, 16], with the stream length where the row has an 'x', and the
+    number of words that went out. Only needs the nibble counts, so the
+    pool mode of lseq_v2 sends no nibbles to the workers.
+    Parameters:
+    -----------
+        counts:     Number of nibbles coming in on every cycle
+        n_pending:  Number of nibbles left over from before the first cycle
+    """
+    e = get_word_cycles(counts, n_pending)
+    C = len(counts)
+    avail = np.cumsum(counts) + n_pending
+
+    # Words out before every cycle, and whether one goes out on it
+    out_by = np.searchsorted(e, np.arange(C), side='right')
+    out_now = np.zeros(C, dtype=bool)
+    out_now[e] = True
+
+    # Row p of a cycle is stream[start + 15 - p] where start is the first
+    # nibble of the word in it, or 'x' past the nibbles that are in.
+    start = 16 * (out_by - out_now)
+    fill = np.where(out_now, 16, avail - start)
+    p = 15 - np.arange(16)
+    idx = start[:, None] + p[None, :]
+    idx[p[None, :] >= fill[:, None]] = int(avail[-1]) if C else n_pending
+
+    return (idx, len(e))
+
+
+def pack_lane(stream, counts, pending=(), index=None):
+    """
+    Packs the nibble stream of one lane (see pack_lane_words) and returns
+    the lane rows (same as lseq_v2) and the nibbles left over at the end.
+    A row shows the word that goes out on that cycle, or else the word
+    being filled. index is the get_lane_index result when it has been
+    worked out already.
+    """
+    if len(pending):
+        stream = np.concatenate([np.array(list(pending)), stream])
+    idx, n_words = index or get_lane_index(counts, len(pending))
+
+    # Nibble labels can take the 'x' as they are, values go through object
+    ext = np.append(stream if stream.dtype.kind == 'U' else stream.astype(object), 'x')
+    return (ext[idx].tolist(), stream[16 * n_words:].tolist())
+
+
+def get_lane_pool(workers=None):
+    """
+    Process pool of the lseq_v2 pool mode. The pool is started on the
+    first call and kept, a call with a different number of workers
+    replaces it.
+    Parameters:
+    -----------
+        workers:    Number of processes
+    """
+    global _lane_pool
+    if _lane_pool is None or _lane_pool[0] != workers:
+        from concurrent.futures import ProcessPoolExecutor
+        if _lane_pool is not None:
+            _lane_pool[1].shutdown()
+        _lane_pool = (workers, ProcessPoolExecutor(max_workers=workers))
+    return _lane_pool[1]
+
+
+def new_lseq_state(L):
+    """
+    Returns the initial state of the lane sequencer for L lanes. cycle is
+    the number of rows sequenced so far and pending holds the nibbles of
+    every lane that are not in an emitted lane word yet.
+    """
+    return {'L': L, 'cycle': 0, 'pending': [[] for i in range(L)]}
+
+
+def s2w(nSamp, R, M, prec):
+    """ 
+    S2W block is the block that converts raw samples to converter words. 
+    This function can be thought of as printing out the parallel input or output
+    interface to/from the block. Remember that in implementation this will be a 
+    dual phase interface with each interface running at 491.52 MHz.
+    Strobes will be used to mark valid samples. Since the purpose of this block
+    is only to extend the precision, the same function can be used to represent
+    both the input and output of this block
+    Parameters:
+    -----------
+        nSamp:  Numeber of samples we are considering.
+        R:      Rate. Multiple of 122.88 MSPs
+                    1: 122.88 MHz
+                    2: 245.76 MHz
+                    3. 368.64 MHz
+                    4: 491.52 MHz
+                    6: 737.28 MHz
+                    8: 983.04 MHz
+        M:      Number of converters. Should be {2, 4, 8, 16}
+        prec:   Precision in bits
+    """
+    
+
+    # Acceptable ranges for parameters
+    acceptable_R = [1, 2, 3, 4, 6, 8]
+    acceptable_M = [2, 4, 8, 16]
+
+    # Assertions to check if parameters are correct
+    assert R in acceptable_R, "Rate Multiplier should be in the range: {1, 2, 3, 4, 6, 8}"
+    assert M in acceptable_M, "Number of converters should be a power of 2: {2, 4, 8, 16}"
+
+    # Get the sample list
+    in_data = get_sample_pattern(nSamp, M, R, prec)
+
+    # Print the input waveform in a beautiful way.
+    # Dont need lanes for this block so set to 0.
+    #print_table(0, R, M, prec, in_data, 's2w', "===== Raw Samples to Converter Samples =====")
+
+    return in_data
+
+def get_lane_map(nSamp, R, M, L, prec, OS=1, S=1, mode='serial', workers=None, executor=None):
+    """
+    Runs the S2W and LSEQ blocks back to back without printing anything
+    and returns the converter interface rows and the lane outputs. This is
+    what the lane mapping script does in __main__ minus the spreadsheet.
+    With OS or S above 1 the S2W rows go through the sample mapping
+    (see map_samples) before the LSEQ and the mapped rows are returned.
+    Parameters:
+    -----------
+        nSamp:  Number of samples
+        R:      Rate. Multiple of 122.88 MSPs
+        M:      Number of converters. Should be {2, 4, 8, 16}
+        L:      Number of lanes
+        prec:   Precision in bits (N')
+        OS:     Sample repeat {1, 2}
+        S:      Samples per converter per frame {1, 2}
+        mode:   Execution mode of lseq_v2 (serial, lanes or pool)
+        workers: Number of processes for the pool mode
+        executor: Executor for the pool mode (see lseq_v2)
+    """
+    s2w_out = s2w(nSamp, R, M, prec)
+    masks = get_strb_masks(nSamp, R)
+    if OS > 1 or S > 1:
+        s2w_out, masks = map_samples(s2w_out, masks, M, prec, OS, S)
+    lane_out = lseq_v2(s2w_out, L, M, R, verbose=False, masks=masks, mode=mode, workers=workers,
+                       executor=executor)
+    return (s2w_out, lane_out)
+
+def os_repeat(data, OS):
+    """
+    Sample repeat. Every converter sample is repeated OS times next to
+    itself, as if the converter had OS digital twins. The rail width goes
+    from M to M * OS sample slots.
+    Parameters:
+    -----------
+        data:   Array of nibbles [cycles, rails, converter slots, nibbles]
+        OS:     Sample repeat
+    """
+    return np.repeat(data, OS, axis=2)
+
+def s_interleave(data, masks, S):
+    """
+    Oversampling. Every S valid cycles of a rail are put together in one
+    row where the S samples of a converter sit next to each other. Sample
+    order in the row follows the nibble order (latest sample first) so
+    that the lanes take them in time order. The row is valid on the cycle
+    of the last of the S samples. A trailing incomplete group is dropped.
+    The rails are grouped independently because their strobes differ for
+    R = 3 and 6.
+    Returns the array [cycles, rails, converter slots, S * nibbles] and
+    the valid masks of the rails.
+    Parameters:
+    -----------
+        data:   Array of nibbles [cycles, rails, converter slots, nibbles]
+        masks:  Valid masks of rail 0 and rail 1 (see get_strb_masks)
+        S:      Samples per converter per frame
+    """
+    C, nRails, nSlots, nNibbles = data.shape
+    out = np.full((C, nRails, nSlots, S * nNibbles), 'x', dtype=data.dtype)
+    out_masks = []
+    for r in range(nRails):
+        idx = np.flatnonzero(masks[r])
+        idx = idx[:idx.size - idx.size % S].reshape(-1, S)
+        # [groups, slots, S, nibbles] with the latest sample first
+        grp = data[idx[:, ::-1], r].transpose(0, 2, 1, 3)
+        out[idx[:, -1], r] = grp.reshape(grp.shape[0], nSlots, S * nNibbles)
+        valid = np.zeros(C, dtype=bool)
+        valid[idx[:, -1]] = True
+        out_masks.append(valid)
+    return (out, tuple(out_masks))
+
+@instrument.timed('sample_mapping')
+def map_samples(in_data, masks, M, prec, OS=1, S=1):
+    """
+    Sample mapping ahead of the LSEQ. Applies the sample repeat (OS) and
+    oversampling (S) to the S2W rows and returns the new rows and valid
+    masks. A row has 2 * M * OS * S * prec / 4 nibbles.
+    Parameters:
+    -----------
+        in_data:    S2W rows (see get_sample_pattern)
+        masks:      Valid masks of rail 0 and rail 1 (see get_strb_masks)
+        M:          Number of converters
+        prec:       Precision in bits (N')
+        OS:         Sample repeat {1, 2}
+        S:          Samples per converter per frame {1, 2}
+    """
+    assert OS in [1, 2], "Sample repeat should be in the range: {1, 2}"
+    assert S in [1, 2], "Oversampling should be in the range: {1, 2}"
+
+    data = np.asarray(in_data).reshape(len(in_data), 2, M, int(prec/4))
+    data = os_repeat(data, OS)
+    data, masks = s_interleave(data, masks, S)
+    return (data.reshape(len(in_data), -1).tolist(), masks)
+
+def get_strb_pattern(R):
+    """
+    This function returns the strobe pattern given the rate. Note that
+    the actual pattern returned in an index. Assumption here is that the
+    clock rate is 491.52 MHz. This is a dual phase implementation. If we 
+    imagine 4 cycle counter at 491.52 then the following returned index indicate
+    a particular pattern.
+
+    index = [0] means [1 0 0 0 0 0 0 0] strobe
+    index = [0 4] means [1 0 0 0 1 0 0 0] strobe
+    index = [0 2 4 6] means [ 1 0 1 0 1 0 1 0] strobe
+    index = [0 1 2 3 4 5 6 7] means [1 1 1 1 1 1 1 1] strobe
+
+    122.88 : 1 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0
+             1 0 0 0 0 0 0 0 1 0 0 0 0 0 0 0
+    245.76 : 1 0 0 0 1 0 0 0 1 0 0 0 1 0 0 0
+             1 0 0 0 1 0 0 0 1 0 0 0 1 0 0 0
+    368.64 : 1 0 1 0 1 0 1 0 1 0 1 0 1 0 1 0
+             1 0 0 0 1 0 0 0 1 0 0 0 1 0 0 0
+    491.52 : 1 0 1 0 1 0 1 0 1 0 1 0 1 0 1 0
+             1 0 1 0 1 0 1 0 1 0 1 0 1 0 1 0
+    737.28 : 1 1 1 1 1 1 1 1 1 1 1 1 1 1 1 1
+             1 0 1 0 1 0 1 0 1 0 1 0 1 0 1 0
+    983.04 : 1 1 1 1 1 1 1 1 1 1 1 1 1 1 1 1
+             1 1 1 1 1 1 1 1 1 1 1 1 1 1 1 1
+    
+    """
+    match R:
+        case 1: # 122.88 MSPs
+            strb_r0 = [0]
+            strb_r1 = [0]
+        case 2: # 245.76 MSPs
+            strb_r0 = [0, 4]
+            strb_r1 = [0, 4]
+        case 3: # 368.64
+            strb_r0 = [0, 2, 4, 6]
+            strb_r1 = [0, 4]
+        case 4: # 491.52
+            strb_r0 = [0, 2, 4, 6]
+            strb_r1 = [0, 2, 4, 6]
+        case 6: # 737.28 
+            strb_r0 = [0, 1, 2, 3, 4, 5, 6, 7]
+            strb_r1 = [0, 2, 4, 6]
+        case 8: # 983.04
+            strb_r0 = [0, 1, 2, 3, 4, 5, 6, 7]
+            strb_r1 = [0, 1, 2, 3, 4, 5, 6, 7]
+    return (strb_r0, strb_r1)
+
+
+
+def get_num_cycles(nSamp, R):
+    """
+    Returns the number of 491.52 MHz cycles needed to cover nSamp samples
+    at rate R. Exact integer arithmetic, for R = 3 and 6 we need 4 cycles
+    for every 3 samples. The 4th cycle will be invalid. This is how the
+    hardware would work.
+    Parameters:
+    -----------
+        nSamp:  Number of samples
+        R:      Rate. Multiple of 122.88 MSPs
+    """
+    match R:
+        case 1:
+            return 4 * nSamp
+        case 2:
+            return 2 * nSamp
+        case 3 | 6:
+            return (4 * nSamp) // 3
+        case 4 | 8:
+            return nSamp
+
+
+def get_strb_masks(nSamp, R):
+    """
+    Returns the valid masks of rail 0 and rail 1, one boolean per cycle.
+    The strobe pattern of get_strb_pattern repeats every 8 cycles, so the
+    masks are the 8 cycle pattern indexed with cycle % 8.
+    Parameters:
+    -----------
+        nSamp:  Number of samples
+        R:      Rate. Multiple of 122.88 MSPs
+    """
+    return get_strb_window(R, 0, get_num_cycles(nSamp, R))
+
+
+def get_strb_window(R, start, stop):
+    """
+    Returns the valid masks of rail 0 and rail 1 for the cycles from start
+    up to (not including) stop. Used to run long captures in blocks.
+    Parameters:
+    -----------
+        R:      Rate. Multiple of 122.88 MSPs
+        start:  First cycle
+        stop:   Cycle after the last one
+    """
+    rem = np.arange(start, stop) % 8
+    masks = []
+    for strb in get_strb_pattern(R):
+        pattern = np.zeros(8, dtype=bool)
+        pattern[strb] = True
+        masks.append(pattern[rem])
+    return tuple(masks)
+
+
+@instrument.timed('s2w')
+def get_sample_pattern(nSamp, M, R, prec):
+    """
+    This function provides rows of samples according to M, R and prec.
+    The nSamp variable is expanded to oSamp based on rates (because we can
+    have invalid cycles where the samples are invalid). 
+    """
+
+    nNibbles        = int(prec/4)
+    
+    # the nSamp parameter is for the number
+    # of samples at a given rate. But since the 
+    # clock rate is 491.52 MHz, we need to adjust
+    # the the number of samples based on the sampling
+    # rate and clock rate. This is important to make sure that all
+    # samples are covered in the analysis
+    valid_r0, valid_r1 = get_strb_masks(nSamp, R)
+    osSamp = valid_r0.size
+
+    # True sample index of every cycle. It moves on after every cycle
+    # where either rail is valid.
+    valid = valid_r0 | valid_r1
+    sidx = np.cumsum(valid) - valid
+
+    # Label of every nibble is prefix + sample index + suffix
+    labels = []
+    for rail in range(2):
+        labels.append([('M' + str(m) + '_R' + str(rail) + '_s', '_n' + str(n))
+                       for m in reversed(range(M)) for n in reversed(range(nNibbles))])
+    empty = ['x'] * (M * nNibbles)
+
+    in_data = []
+    for v0, v1, si in zip(valid_r0.tolist(), valid_r1.tolist(), sidx.tolist()):
+        si = str(si)
+        literal = [] # Entire row in the table
+        for rail, v in ((0, v0), (1, v1)):
+            if v: # this is a valid cycle
+                literal.extend([pre + si + suf for pre, suf in labels[rail]])
+            else:
+                literal.extend(empty)
+        in_data.append(literal)
+    
+    instrument.count('rows_generated', osSamp)
+    return in_data
+
+
+def get_num_phases(R):
+    '''
+    Depending on the rate we will need either 1 or 2 phases.
+    R: Rate
+          1: 122.88 MHz
+          2: 245.76 MHz
+          3. 368.64 MHz
+          4: 491.52 MHz
+          6: 737.28 MHz
+          8: 983.04 MHz
+    '''
+    return 2
+    if R in [1, 2, 3, 4]:
+        P = 1
+    else:
+        P = 2
+
+    return P
+
+def get_sample_rate(R):
+    """
+    Returns the actual sample rate given R
+    Parameters:
+    R: Rate
+        1 = 122.88
+        2 = 245.76
+        3 = 368.64
+        4 = 491.52
+        6 = 737.28
+        8 = 983.04
+    """
+    match R:
+        case 1:
+            Fs = 122.88
+        case 2:
+            Fs = 245.76
+        case 3:
+            Fs = 368.64
+        case 4:
+            Fs = 491.52
+        case 6:
+            Fs = 737.28
+        case 8: 
+            Fs = 983.04
+    return Fs
+
+@instrument.timed('print_table')
+def print_table(Lid, R, M, prec, in_data, block, mesg=''):
+    """
+    This function prints out a table with samples and byte positions.
+    The printing is such that the lowest converter index is at the lower
+    end. The sample is written in big-endian format
+    Parameters:
+    Lid: Lane ID for which table is being printed
+    R : Rate
+    M : Number of converters
+    prec: Precising in bits
+    in_data: rows to be printed
+    block: The function handles tables for various blocks in the design.
+    mesg: Any message you would like to print before the table gets printed
+    """
+    from prettytable import PrettyTable
+
+    nNibbles = int(prec/4)
+    inTab = PrettyTable()
+    fields = []
+    
+    # Get the number of phases based in rate
+    P = get_num_phases(R)
+    
+    # For the header of the table.
+    if(block == 's2w'):
+        for m in reversed(range(M)):
+            for p in reversed(range(P)):
+                for n in reversed(range(nNibbles)):
+                    title = 'M' + str(m) + '_P' + str(p) + '_' + 'N' + str(n)
+                    fields.append(title)
+                    
+
+        #Print the table
+        print(mesg)
+        print("============= Parameters")
+        print("Number of Converters: ", M)
+        print("Number of phases: ", P)
+        print("Precision: ", prec)
+        print("Sampling Rate: ", get_sample_rate(R), "MSps")
+        print("Clock Rate: 491.52 MHz")
+    elif(block == 'lseq'):
+        title = ['63:60', '59:56', '55:52', '51:48', '47:44', '43:40', '39:36', '35:32', '31:28', '27:24', '23:20', '19:16', '15:12', '11:8', '7:4', '3:0']
+        for t in range(16):
+            fields.append(title[t])
+
+    
+    # Add the header and the rows
+    inTab.field_names = fields
+    for row in in_data:
+        inTab.add_row(row)
+    instrument.count('rows_printed', len(in_data))
+    
+    # Print the table
+    print(inTab)
+
+@instrument.timed('xlsx_sheet')
+def xls_sheet_conv_if(wb, M, prec, in_data, xls_start_row, xls_start_col, ws_name):
+    '''
+    This function will write the converter interface nibble literals into 
+    the worksheet. Note that in_data is given as such that the rows are
+    clock cycles and the columns are converter samples. Its also set in
+    big endian notation. in_data is a list of lists.  
+    '''
+    
+    ws = wb.add_worksheet(ws_name)
+    
+    cell_format = wb.add_format()
+    #cell_format.set_bold(True)
+    #cell_format.set_bg_color('yellow')
+    cell_format.set_center_across()
+    
+    merge_format = wb.add_format({
+    'bold':     True,
+    'border':   6,
+    'align':    'center',
+    'valign':   'vcenter',
+    'fg_color': '#D7E4BC',
+    })
+    
+    # First figure out the number of headers depending on M
+    header = []
+    for p in reversed(range(2)):
+        for m in range(M):
+            text = "M" + str(m) + "_P" + str(p)
+            header.append(text)
+    
+    # Number of nibbles will dictate how many cells need to be merged
+    # for the header
+    num_nibbles = int(prec/4);
+    
+    fr = int(xls_start_row);
+    fc = int(xls_start_col);
+    lc = int(xls_start_col);
+    
+    for h in range(len(header)):
+        lr = fr + num_nibbles - 1;
+        ws.merge_range(fr, fc, lr, lc, header[h], merge_format)
+        fr = lr + 1
+    
+    for r in in_data:
+        fr = xls_start_row;
+        fc = fc + 1
+        for s in reversed(r):
+            ws.write(fr, fc, s, cell_format)
+            fr = fr+1
+    
+    instrument.count('cells_written', len(header) + sum(len(r) for r in in_data))
+    
+
+@instrument.timed('xlsx_sheet')
+def xls_sheet_lane_if(wb, L, prec, in_data, xls_start_row, xls_start_col, ws_name):
+    '''
+    This function will write the lane interface nibble literals into 
+    the worksheet. in_data is a list of lists. The sublist is made up of
+    elements that correspond to a clock cycle. 
+    '''
+    
+    ws = wb.add_worksheet(ws_name)
+    
+    cell_format = wb.add_format()
+    #cell_format.set_bold(True)
+    #cell_format.set_bg_color('yellow')
+    cell_format.set_center_across()
+    
+    merge_format = wb.add_format({
+    'bold':     True,
+    'border':   6,
+    'align':    'center',
+    'valign':   'vcenter',
+    'fg_color': '#D7E4BC',
+    })
+    
+    # First figure out the number of headers depending on M
+    header = []
+    for l in reversed(range(L)):
+        text = "L" + str(l)
+        header.append(text)
+    
+    # Number of nibbles will dictate how many cells need to be merged
+    # for the header
+    num_nibbles = int(prec/4);
+    
+    fr = int(xls_start_row);
+    fc = int(xls_start_col);
+    lc = int(xls_start_col);
+    
+    for h in range(len(header)):
+        lr = fr + num_nibbles - 1;
+        ws.merge_range(fr, fc, lr, lc, header[h], merge_format)
+        fr = lr + 1
+    
+    ln_idx = 0
+    for l in in_data:
+        row_start_idx = xls_start_row + ln_idx * num_nibbles
+        fc = xls_start_col
+        for s in l: 
+            fc = fc + 1
+            fr = row_start_idx
+            for n in reversed(s):
+                ws.write(fr, fc, n, cell_format)
+                fr = fr + 1
+        
+        # Increment column only if last last lane has been processed
+        ln_idx += 1
+    
+    instrument.count('cells_written', len(header) + sum(len(s) for l in in_data for s in l))
+        
+    
+    
+            
+###############################
+#       MAIN FUNCTION
+###############################
+
+def main(Np=16, M=8, L=16, R=1, nSamp=12, book_name=None, verbose=True, OS=1, S=1, mode='serial'):
+    """
+    Runs the S2W and LSEQ blocks, prints the lane outputs and writes the
+    converter interface, nibble group output and lane output to an
+    excel sheet.
+    Parameters:
+    -----------
+        Np:         Precision (N')
+        M:          Number of converters
+        L:          Number of lanes
+        R:          Sampling rate.
+                        1: 122.88 MHz
+                        2: 245.76 MHz
+                        3. 368.64 MHz
+                        4: 491.52 MHz
+                        6: 737.28 MHz
+                        8: 983.04 MHz
+        nSamp:      Number of Samples 
+        book_name:  Name of the xlsx workbook. Derived from the parameters
+                    if not given.
+        verbose:    Pretty print the lane outputs
+        OS:         Sample repeat {1, 2}
+        S:          Samples per converter per frame {1, 2}
+        mode:       Execution mode of lseq_v2 (serial, lanes or pool)
+    """
+    import xlsxwriter as xls
+
+    # XLSX workbook
+    if book_name is None:
+        book_name = "M_" + str(M) + "_L_" + str(L) + "_Np_" + str(Np) + "_R_" + str(int(get_sample_rate(R)))
+        if OS > 1 or S > 1:
+            book_name = book_name + "_OS_" + str(OS) + "_S_" + str(S)
+        book_name = book_name + ".xlsx"
+    wb = xls.Workbook(book_name)
+    
+    
+    # Prepare input to block
+    in_samples = s2w(nSamp, R, M, 16)
+    xls_sheet_conv_if(wb, M, 16, in_samples, 5, 5, "Converter Interface")
+    
+    # Output of s2w_block
+    s2w_out = s2w(nSamp, R, M, Np)
+    xls_sheet_conv_if(wb, M, Np, s2w_out, 5, 5, "Nibble Group Output")
+    
+    # Sample repeat and oversampling
+    masks = get_strb_masks(nSamp, R)
+    if OS > 1 or S > 1:
+        s2w_out, masks = map_samples(s2w_out, masks, M, Np, OS, S)
+        xls_sheet_conv_if(wb, M * OS, Np * S, s2w_out, 5, 5, "Sample Mapping Output")
+
+    # lseq
+    lane_out = lseq_v2(s2w_out, L, M, R, verbose, masks, mode=mode)
+    xls_sheet_lane_if(wb, L, 64, lane_out, 5, 5, "Lane Output")
+     
+    # xlsxwriter writes out the whole workbook on close
+    with instrument.stage('xlsx_close'):
+        wb.close()
+
+
+if __name__ == "__main__":
+    main()